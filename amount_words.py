@@ -0,0 +1,60 @@
+"""
+Amounts in words, Indian numbering (thousand, lakh, crore).
+
+rupees_in_words(n) spells n exactly as the bill always has, i.e. the same
+text as num2words(n, lang='en_IN').replace(',', '').title(): "and" before
+a last group under a hundred, hyphenated tens, every word capitalized.
+Amounts repeat a lot across invoices, so results are memoized.
+"""
+from functools import lru_cache
+
+ONES = [
+    "Zero", "One", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine",
+    "Ten", "Eleven", "Twelve", "Thirteen", "Fourteen", "Fifteen", "Sixteen",
+    "Seventeen", "Eighteen", "Nineteen",
+]
+TENS = ["", "", "Twenty", "Thirty", "Forty", "Fifty", "Sixty", "Seventy", "Eighty", "Ninety"]
+
+# Largest first; anything above a crore is counted in crores
+SCALES = [(10 ** 7, "Crore"), (10 ** 5, "Lakh"), (1000, "Thousand"), (100, "Hundred")]
+
+_BELOW_100 = ONES + [
+    TENS[n // 10] + ("-" + ONES[n % 10] if n % 10 else "")
+    for n in range(20, 100)
+]
+
+
+@lru_cache(maxsize=4096)
+def number_in_words(n):
+    """Cardinal words for a whole number."""
+    if n < 0:
+        return "Minus " + number_in_words(-n)
+    if n < 100:
+        return _BELOW_100[n]
+    for size, name in SCALES:
+        if n >= size:
+            div, mod = divmod(n, size)
+            words = f"{number_in_words(div)} {name}"
+            if not mod:
+                return words
+            return f"{words} {'And ' if mod < 100 else ''}{number_in_words(mod)}"
+
+
+def rupees_in_words(rupees):
+    """'One Thousand And Five Rupees Only'"""
+    return number_in_words(rupees) + " Rupees Only"
+
+
+def amount_in_words(paise, with_paise=True):
+    """
+    Words for an amount in paise. With with_paise=False the amount is
+    rounded half-up to whole rupees, as printed on the bill.
+    """
+    if paise < 0:
+        return "Minus " + amount_in_words(-paise, with_paise)
+    rupees, rest = divmod(paise, 100)
+    if not with_paise:
+        return rupees_in_words(rupees + (rest >= 50))
+    if not rest:
+        return rupees_in_words(rupees)
+    return f"{number_in_words(rupees)} Rupees And {number_in_words(rest)} Paise Only"
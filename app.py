@@ -1,22 +1,131 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect
-import io, os, re
+from flask import Flask, Response, render_template, request, jsonify, send_file, session, redirect
+import hashlib, io, math, os, re, tempfile, threading, time, zipfile
+from concurrent.futures import BrokenExecutor
 from datetime import datetime
-from bill_template import generate_invoice
+from invoice_math import compute_totals, gst_mode_for
 from data_manager import DatabaseManager
+from render_queue import BatchRenderPool, LocalRenderQueue, QueueFull, get_job_store
+from invoice_archive import get_archive, invoice_key, invoice_meta
+import db
+import metrics
+import pdf_profiles
+import sales_export
+import bulk_import
+import gst_validation
+from gst_validation import format_gstin
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "supersecret")
+# Static assets are fingerprinted by their CDN URLs or change only on deploy
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = int(os.environ.get("STATIC_MAX_AGE", 86400))
+metrics.init_app(app)
 data_manager = DatabaseManager()
+metrics.register_collector(data_manager.cache_metrics)
+
+def save_rendered_job(job):
+    # Async bills are recorded once their PDF exists, never for a failed render
+    record_invoice(job.data)
+
+render_queue = LocalRenderQueue(store=get_job_store(), on_done=save_rendered_job)
+batch_pool = BatchRenderPool()
+archive = get_archive()
 
 ADMIN_USER = os.environ.get("ADMIN_USER")
 ADMIN_PASS = os.environ.get("ADMIN_PASS")
 
+# ---------- Warmup ----------
+# Importing this module opens no connection and loads no ReportLab; the
+# first request pays for both unless warmup() has run. WARMUP_ON_START=1
+# runs it in the background as soon as the app is imported.
+def warmup():
+    """Connect to Mongo, set up indexes and load what the first requests need."""
+    start = time.perf_counter()
+    try:
+        data_manager.data_version()  # first collection access: connection + indexes
+        data_manager.get_bank_details()
+        for table in ("parties", "transports", "cities"):
+            data_manager.name_index(table)
+        import bill_template  # noqa: F401
+    except Exception as e:
+        app.logger.warning("Warmup failed, first requests will load lazily: %s", e)
+        return False
+    app.logger.info("Warmup done in %.0f ms", (time.perf_counter() - start) * 1000)
+    return True
+
+if os.environ.get("WARMUP_ON_START", "").lower() in ("1", "true", "yes"):
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
+
+# ---------- Worker lifecycle ----------
+# Hooks for a prefork server (see gunicorn.conf.py). The app may be imported
+# once in the master and forked; nothing holding a Mongo connection may be
+# carried across the fork.
+def after_fork():
+    """Run first thing in each new worker process."""
+    global archive
+    db.reset_client()
+    data_manager.reset_connections()
+    render_queue.reset()
+    batch_pool.reset()
+    archive = get_archive()
+
+def shutdown():
+    """Write out buffered data and release connections before a worker exits."""
+    data_manager.flush_cities()
+    render_queue.shutdown(wait=False)
+    batch_pool.shutdown(wait=False)
+    db.close_client()
+
 # ---------- Routes ----------
+# Rendered form page for the current reference-data version
+_form_page = {"version": None, "html": None, "etag": None, "modified": None}
+
+def render_form_page():
+    version = data_manager.data_version()
+    page = _form_page
+    if page["html"] is None or page["version"] != version:
+        html = render_template("form.html")
+        page = {
+            "version": version,
+            "html": html,
+            "etag": hashlib.sha1(f"{version}:{html}".encode("utf-8")).hexdigest(),
+            "modified": datetime.utcnow().replace(microsecond=0),
+        }
+        _form_page.update(page)
+    return page
+
 @app.route("/")
 def form():
-    parties = data_manager.get_all_parties()
-    transports = data_manager.get_all_transports()
-    return render_template("form.html", parties=parties, transports=transports)
+    # Party and transport names are looked up as the user types (/search/*)
+    page = render_form_page()
+    response = Response(page["html"], mimetype="text/html")
+    response.set_etag(page["etag"])
+    response.last_modified = page["modified"]
+    # Browsers may keep the page but must revalidate; a 304 costs no render
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def search_names(table):
+    """Select2 ajax response for ?q=&page= over one name index."""
+    page = request.args.get("page", 1, type=int)
+    names, more = data_manager.search_names(table, request.args.get("q", ""), page)
+    return jsonify({
+        "results": [{"id": name, "text": name} for name in names],
+        "pagination": {"more": more},
+    })
+
+@app.route("/search/parties")
+def search_parties():
+    return search_names("parties")
+
+@app.route("/search/transports")
+def search_transports():
+    return search_names("transports")
+
+@app.route("/search/cities")
+def search_cities():
+    # Cities already saved, as "City (S.T.)"; the form falls back to
+    # Nominatim only when nothing here matches
+    return search_names("cities")
 
 @app.route("/get_party_details")
 def get_party_details():
@@ -56,49 +165,146 @@ def add_pending():
 def message_page():
     return render_template("message.html")
 
-@app.route("/download", methods=["POST"])
-def download():
-    form = request.form
-
-    for field in ["bill_no","date","customer_name","ch_no","gstin","transport"]:
-        if not form.get(field):
-            return f"{field} is required", 400
+REQUIRED_FIELDS = ["bill_no", "date", "customer_name", "ch_no", "gstin", "transport"]
 
+def build_invoice_data(fields, items):
+    """Build the generate_invoice payload from form fields and (name, qty, unit, rate) rows."""
+    items = list(items)
     try:
-        formatted_date = datetime.strptime(form.get("date", ""), "%Y-%m-%d").strftime("%d/%m/%Y")
+        formatted_date = datetime.strptime(fields.get("date", ""), "%Y-%m-%d").strftime("%d/%m/%Y")
     except:
-        formatted_date = form.get("date", "")
+        formatted_date = fields.get("date", "")
 
     data = {
-        "invoice_no": form.get("bill_no", ""),
+        "invoice_no": fields.get("bill_no", ""),
         "date": formatted_date,
-        "party_name": form.get("customer_name", ""),
-        "place": form.get("ch_no", ""),
-        "party_gstin": format_gstin(form.get("gstin", "")),
-        "transport": form.get("transport", ""),
-        "transport_gstin": form.get("transport_gstin", ""),  # ✅ now included
-        "units" : form.getlist('unit[]'),
+        "party_name": fields.get("customer_name", ""),
+        "place": fields.get("ch_no", ""),
+        "party_gstin": format_gstin(fields.get("gstin", "")),
+        "transport": fields.get("transport", ""),
+        "transport_gstin": fields.get("transport_gstin", ""),  # ✅ now included
+        "units" : [unit for _, _, unit, _ in items],
         "items": []
     }
 
-    print(data)
-
-    for name, qty, unit, rate in zip(
-        form.getlist("item_name[]"),
-        form.getlist("qty[]"),
-        form.getlist("unit[]"),
-        form.getlist("rate[]")
-    ):
+    for name, qty, unit, rate in items:
         if name and qty and unit and rate:
             data["items"].append({
                 "name": name,
-                "qty": float(qty),
+                "qty": parse_amount(qty, "qty", name),
                 "unit": unit,
-                "rate": float(rate)
+                "rate": parse_amount(rate, "rate", name)
             })
+    return data
+
+def parse_amount(value, field, item):
+    """float(value), or ValueError naming the item when it is not a finite number."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"{field} of {item!r} must be a number, got {value!r}")
+    return number
+
+def invoice_filename(data):
+    return f"{data['invoice_no']}_ANANT_CREATION.pdf"
+
+@app.route("/download", methods=["POST"])
+def download():
+    form = request.form
+
+    for field in REQUIRED_FIELDS:
+        if not form.get(field):
+            return f"{field} is required", 400
 
-    output = io.BytesIO()
-    total = generate_invoice(data, output)
+    try:
+        data = build_invoice_data(form, zip(
+            form.getlist("item_name[]"),
+            form.getlist("qty[]"),
+            form.getlist("unit[]"),
+            form.getlist("rate[]")
+        ))
+    except ValueError as e:
+        return str(e), 400
+
+    print(data)
+
+    banks = data_manager.get_bank_details()
+    key = invoice_key(data, banks, pdf_profiles.PDF_PROFILE)
+
+    # Identical bill rendered before: answer from the archive
+    if archive:
+        if request.if_none_match.contains(key) and archive.exists(key):
+            return not_modified(key)
+        hit = archive.get(key)
+        if hit:
+            pdf, meta = hit
+            remember_invoice(data, meta.get("total"))
+            record_invoice(data)
+            return send_invoice_pdf(pdf, invoice_filename(data), key)
+
+    # Async mode: queue the render and let the client poll /jobs/<id>
+    if request.args.get("async") or form.get("async"):
+        try:
+            job = render_queue.submit(data, banks, archive_key=key)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        return jsonify({**job.to_dict(), "status_url": f"/jobs/{job.id}"}), 202
+
+    from bill_template import generate_invoice  # ReportLab is loaded on first render
+
+    # Large PDFs spill to disk instead of staying in worker memory while
+    # they are archived and sent
+    output = tempfile.SpooledTemporaryFile(max_size=pdf_profiles.PDF_SPOOL_MAX_BYTES)
+    with metrics.span("render"):
+        total = generate_invoice(data, output, banks=banks)
+    size = output.tell()
+    remember_invoice(data, total)
+    output.seek(0)
+    archive_invoice(key, output, data, total)
+    record_invoice(data)
+
+    output.seek(0)
+    return send_invoice_pdf(output, invoice_filename(data), key, size)
+
+def archive_invoice(key, pdf, data, total):
+    if not archive:
+        return
+    try:
+        archive.put(key, pdf, invoice_meta(data, total))
+    except Exception as e:
+        # A failing archive must not block the download itself
+        app.logger.warning("Could not archive invoice %s: %s", data["invoice_no"], e)
+
+def record_invoice(data):
+    """Save the invoice for exports and the GST summary; True if it was saved."""
+    try:
+        data_manager.save_invoice(data, compute_totals(data["items"], gst_mode_for(data["party_gstin"])))
+        return True
+    except Exception as e:
+        # Invoices live in Mongo whatever STORAGE_BACKEND is; a bill that
+        # rendered is still sent when Mongo is down or not configured
+        app.logger.warning("Could not save invoice %s: %s", data["invoice_no"], e)
+        return False
+
+def send_invoice_pdf(pdf, filename, key, size=None):
+    """Send PDF bytes, or a file of `size` bytes (streamed in chunks and closed after)."""
+    if isinstance(pdf, bytes):
+        pdf, size = io.BytesIO(pdf), len(pdf)
+    response = send_file(pdf, as_attachment=True, download_name=filename,
+                         mimetype="application/pdf", conditional=False, max_age=0)
+    response.content_length = size
+    response.set_etag(key)
+    response.cache_control.private = True
+    return response
+
+def not_modified(key):
+    response = Response(status=304)
+    response.set_etag(key)
+    return response
+
+def remember_invoice(data, total):
     session['invoice_data'] = {
         "invoice_no": data["invoice_no"],
         "date": data["date"],
@@ -107,9 +313,221 @@ def download():
         "total_value": total,
     }
 
-    output.seek(0)
-    filename = f"{data['invoice_no']}_ANANT_CREATION.pdf"
-    return send_file(output, as_attachment=True, download_name=filename, mimetype="application/pdf")
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = render_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job"}), 404
+
+    if job.status == "done":
+        remember_invoice(job.data, job.total)
+        if job.archive_key:
+            archive_invoice(job.archive_key, job.pdf, job.data, job.total)
+            return send_invoice_pdf(job.pdf, invoice_filename(job.data), job.archive_key)
+        return send_file(io.BytesIO(job.pdf), as_attachment=True,
+                         download_name=invoice_filename(job.data), mimetype="application/pdf")
+    if job.status in ("queued", "running"):
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.to_dict()), 504 if job.status == "timeout" else 500
+
+@app.route("/invoice/<path:invoice_no>")
+def archived_invoice(invoice_no):
+    """Latest archived PDF for an invoice number, without re-rendering."""
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+
+    key = archive.find_by_invoice_no(invoice_no) if archive else None
+    if not key:
+        return jsonify({"error": "Invoice not found"}), 404
+    if request.if_none_match.contains(key):
+        return not_modified(key)
+
+    hit = archive.get(key)
+    if not hit:
+        return jsonify({"error": "Invoice not found"}), 404
+    pdf, meta = hit
+    return send_invoice_pdf(pdf, f"{meta['invoice_no']}_ANANT_CREATION.pdf", key)
+
+# ---------- Batch download ----------
+class _ZipStream:
+    """Write-only sink for zipfile; the response generator drains it after each entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_invoice_zip(invoices):
+    """Yield a ZIP archive chunk by chunk as each invoice finishes rendering."""
+    from bill_template import generate_invoices_batch
+
+    sink = _ZipStream()
+    seen = {}
+    errors = []
+    pool = batch_pool.get()
+    batch = generate_invoices_batch(invoices, max_workers=batch_pool.workers,
+                                    banks=data_manager.get_bank_details(), pool=pool)
+    # PDFs are already compressed, so store them as-is
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for data, pdf_bytes, _total, error in batch:
+            if isinstance(error, BrokenExecutor):
+                batch_pool.discard(pool)
+            if error is None and not record_invoice(data):
+                error = "rendered but not saved"
+            if error is not None:
+                errors.append(f"{data['invoice_no']}: {error}")
+                if pdf_bytes is None:
+                    continue
+
+            filename = invoice_filename(data)
+            count = seen.get(filename, 0)
+            seen[filename] = count + 1
+            if count:
+                filename = filename.replace(".pdf", f"_{count}.pdf")
+
+            zf.writestr(filename, pdf_bytes)
+            yield sink.drain()
+
+        if errors:
+            zf.writestr("errors.txt", "\n".join(errors))
+    yield sink.drain()
+
+@app.route("/download_batch", methods=["POST"])
+def download_batch():
+    invoices = request.get_json(silent=True)
+    if not isinstance(invoices, list) or not invoices:
+        return jsonify({"error": "Expected a JSON list of invoices"}), 400
+
+    batch = []
+    for i, entry in enumerate(invoices):
+        if not isinstance(entry, dict):
+            return jsonify({"error": f"Invoice {i} must be an object"}), 400
+        for field in REQUIRED_FIELDS:
+            if not entry.get(field):
+                return jsonify({"error": f"Invoice {i}: {field} is required"}), 400
+
+        items = [
+            (item.get("name"), item.get("qty"), item.get("unit"), item.get("rate"))
+            for item in entry.get("items", []) if isinstance(item, dict)
+        ]
+        try:
+            batch.append(build_invoice_data(entry, items))
+        except ValueError as e:
+            return jsonify({"error": f"Invoice {i} ({entry['bill_no']}): {e}"}), 400
+
+    filename = f"invoices_{datetime.now():%Y%m%d_%H%M%S}.zip"
+    return Response(
+        stream_invoice_zip(batch),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.route("/admin/gst_summary")
+def admin_gst_summary():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+
+    start = request.args.get("from", "")
+    end = request.args.get("to", "")
+    if not re.match(r"^\d{4}-\d{2}$", start) or not re.match(r"^\d{4}-\d{2}$", end):
+        return jsonify({"error": "from and to must be YYYY-MM"}), 400
+
+    return jsonify(data_manager.get_gst_summary(start, end, request.args.get("party")))
+
+# ---------- Validation ----------
+@app.route("/validate", methods=["GET", "POST"])
+def validate_numbers():
+    """
+    GET ?gstin=... checks one number; POST {"values": [...]} checks a batch.
+    Each result has type (GST/PAN/AADHAAR/INVALID), valid, state and error.
+    """
+    if request.method == "GET":
+        return jsonify(gst_validation.validate(request.args.get("gstin", ""))._asdict())
+
+    values = (request.get_json(silent=True) or {}).get("values")
+    if not isinstance(values, list):
+        return jsonify({"error": "Expected {values: [...]}"}), 400
+    if len(values) > gst_validation.BATCH_LIMIT:
+        return jsonify({"error": f"At most {gst_validation.BATCH_LIMIT} values per request"}), 400
+
+    results = gst_validation.validate_many(values)
+    return jsonify({
+        "results": [r._asdict() for r in results],
+        "valid": sum(r.valid for r in results),
+        "invalid": sum(not r.valid for r in results),
+    })
+
+# ---------- Exports ----------
+def export_range():
+    """Parse ?from=YYYY-MM-DD&to=YYYY-MM-DD; returns (start, end) or None."""
+    try:
+        start = datetime.strptime(request.args.get("from", ""), "%Y-%m-%d")
+        end = datetime.strptime(request.args.get("to", ""), "%Y-%m-%d")
+    except ValueError:
+        return None
+    return (start, end) if start <= end else None
+
+@app.route("/export/sales_register.csv")
+def export_sales_register():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+    date_range = export_range()
+    if not date_range:
+        return jsonify({"error": "from and to must be YYYY-MM-DD"}), 400
+
+    start, end = date_range
+    invoices = data_manager.iter_invoices(start, end)
+    filename = f"sales_register_{start:%Y%m%d}_{end:%Y%m%d}.csv"
+    return Response(
+        sales_export.sales_register_csv(invoices),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.route("/export/gstr1.json")
+def export_gstr1():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+    date_range = export_range()
+    if not date_range:
+        return jsonify({"error": "from and to must be YYYY-MM-DD"}), 400
+
+    start, end = date_range
+    b2b = data_manager.iter_invoices(start, end, registered=True, by_party=True)
+    b2c = data_manager.sum_invoices(start, end, registered=False, by_rate=True)
+    filename = f"gstr1_{start:%Y%m%d}_{end:%Y%m%d}.json"
+    return Response(
+        sales_export.gstr1_json(b2b, b2c, f"{end:%m%Y}"),
+        mimetype="application/json",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@app.route("/admin/audit_totals")
+def audit_totals():
+    """Recompute stored invoice totals; ?from=&to= limits the date range."""
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+    date_range = export_range() if request.args.get("from") or request.args.get("to") else (None, None)
+    if not date_range:
+        return jsonify({"error": "from and to must be YYYY-MM-DD"}), 400
+
+    checked, mismatches = data_manager.audit_invoices(*date_range)
+    return jsonify({"checked": checked, "mismatched": len(mismatches), "mismatches": mismatches[:1000]})
+
+# ---------- Metrics ----------
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 # ---------- Admin ----------
 @app.route("/admin/login", methods=["GET", "POST"])
@@ -150,36 +568,86 @@ def admin_reject(type_, name):
     data_manager.reject_pending(type_, name)
     return jsonify({"status": "rejected"})  # ✅ respond with JSON instead of redirect
 
+@app.route("/admin/bulk_pending", methods=["POST"])
+def admin_bulk_pending():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    action = data.get("action")
+    items = data.get("items")
+    if action not in ("approve", "reject") or not isinstance(items, list):
+        return jsonify({"error": "Expected {action: approve|reject, items: [{type, name}]}"}), 400
+
+    results = data_manager.resolve_pending_bulk(
+        action, [(i.get("type"), i.get("name")) for i in items if isinstance(i, dict)]
+    )
+    return jsonify({"action": action, "results": results})
+
 # --------------------------
 # ✅ ADMIN PANEL MANAGEMENT
 # --------------------------
-from flask import jsonify, request
-from bson.objectid import ObjectId, InvalidId
-from db import get_collection
-
-def serialize(doc):
-    doc["id"] = str(doc["_id"])
-    del doc["_id"]
-    return doc
-
 @app.route("/admin")
 def admin_home():
     return render_template("admin.html")
 
 
+# Fields each admin table can be searched (?q=) and filtered (?field=value) on
+ADMIN_TABLE_FIELDS = {
+    "parties": ["name", "gstin", "place"],
+    "transports": ["name", "gstin"],
+    "cities": ["city", "state"],
+    "pending_requests": ["type", "name", "gstin", "place"],
+    "bank_details": ["bank_name", "account_number", "ifsc"],
+}
+ADMIN_PAGE_SIZE = 100
+ADMIN_MAX_PAGE_SIZE = 1000
+
+def admin_page_query(table, args):
+    """(store.page() keyword arguments, page size) for one page of /admin/data."""
+    search = ADMIN_TABLE_FIELDS[table]
+    fields = None
+    if args.get("fields"):
+        fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+
+    limit = min(max(args.get("limit", ADMIN_PAGE_SIZE, type=int), 1), ADMIN_MAX_PAGE_SIZE)
+    query = {
+        "after": args.get("after"),
+        "filters": {field: args[field] for field in search if args.get(field)},
+        "q": args.get("q", "").strip(),
+        "search": search,
+        "fields": fields,
+    }
+    return query, limit
+
+def stream_admin_page(rows, limit):
+    """Yield {"items": [...], "next": <last id or null>} one document at a time."""
+    yield '{"items":['
+    last_id = None
+    for n, doc in enumerate(rows):
+        if n == limit:
+            # One document past the page: there is a next page
+            yield '],"next":%s}' % app.json.dumps(last_id)
+            return
+        last_id = doc["id"]
+        yield ("," if n else "") + app.json.dumps(doc)
+    yield '],"next":null}'
+
 @app.route("/admin/data")
 def admin_data():
     table = request.args.get("table")
 
-    if table not in ["parties", "transports", "cities", "pending_requests", "bank_details"]:
+    if table not in ADMIN_TABLE_FIELDS:
         return jsonify({"error": "Invalid table"}), 400
 
-    docs = list(get_collection(table).find({}))
-    docs = [serialize(d) for d in docs]  # convert _id → id
-
-    return jsonify(docs)
-
+    query, limit = admin_page_query(table, request.args)
+    try:
+        # One row past the page tells whether there is a next one
+        rows = data_manager.store.page(table, limit=limit + 1, **query)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
 
+    return Response(stream_admin_page(rows, limit), mimetype="application/json")
 
 
 @app.route("/admin/add", methods=["POST"])
@@ -191,11 +659,40 @@ def admin_add():
     if table not in allowed:
         return jsonify({"error": "Invalid table"}), 400
 
-    get_collection(table).insert_one(data)
+    data_manager.store.insert(table, {k: v for k, v in data.items() if k != "table"})
+    if table in ("parties", "transports"):
+        data_manager.index_name(table, data.get("name"))
+    if table == "cities":
+        data_manager.index_city(data.get("city"), data.get("state"))
+    if table in ("parties", "transports", "bank_details"):
+        data_manager.reference_changed()
     return jsonify({"status": "ok"})
 
 
 
+@app.route("/admin/import", methods=["POST"])
+def admin_import():
+    if not session.get("admin"):
+        return jsonify({"error": "unauthorized"}), 401
+
+    table = request.form.get("table")
+    upload = request.files.get("file")
+    if table not in bulk_import.TABLE_FIELDS:
+        return jsonify({"error": "Invalid table"}), 400
+    if not upload or not upload.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    try:
+        report = bulk_import.import_file(
+            data_manager, table, upload.stream, upload.filename,
+            dry_run=request.form.get("dry_run") in ("1", "true", "on"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(report)
+
+
+
 @app.route("/admin/delete", methods=["POST"])
 def admin_delete():
     data = request.json
@@ -210,56 +707,24 @@ def admin_delete():
     if table not in ALLOWED_TABLES:
         return jsonify({"error": "Invalid table"}), 400
 
-    # ✅ Validate record_id
+    # ✅ Delete record (a malformed id is rejected by the backend)
     try:
-        obj_id = ObjectId(record_id)
-    except (InvalidId, TypeError):
+        deleted = data_manager.store.delete(table, record_id)
+    except ValueError:
         return jsonify({"error": "Invalid record id"}), 400
 
-    # ✅ Delete record
-    result = get_collection(table).delete_one({"_id": obj_id})
-
-    if result.deleted_count == 0:
+    if deleted is None:
         return jsonify({"error": "Record not found"}), 404
 
-    return jsonify({"status": "deleted"})
+    if table in ("parties", "transports"):
+        data_manager.forget_name(table, deleted.get("name"))
+    if table == "cities":
+        data_manager.forget_city(deleted.get("city"), deleted.get("state"))
+    if table in ("parties", "transports", "bank_details"):
+        data_manager.reference_changed()
 
+    return jsonify({"status": "deleted"})
 
-def format_gstin(gstin: str) -> str:
-    """Format GSTIN by inserting spaces every 4 characters for readability."""
-    gstin = gstin.replace(" ", "").upper()  # Remove existing spaces and normalize case
-    print(identify_number_type(gstin))
-    if identify_number_type(gstin) == "GST" and identify_number_type(gstin) != "INVALID":
-        return gstin  # Return as is if not a valid GSTIN
-    else:
-        return f"URP-{gstin}"
-    
-
-def identify_number_type(number: str) -> str:
-    """
-    Identify whether the input is a GST number, PAN number, or Aadhaar number.
-    Returns one of: 'GST', 'PAN', 'AADHAAR', or 'INVALID'
-    """
-
-    number = number.strip().upper()  # Normalize input
-    
-    # GSTIN format: 15 characters -> 2 digits, 10 chars (PAN), 1 char, Z, 1 checksum
-    gst_pattern = re.compile(r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$')
-    
-    # PAN format: 10 characters -> 5 letters, 4 digits, 1 letter
-    pan_pattern = re.compile(r'^[A-Z]{5}[0-9]{4}[A-Z]{1}$')
-    
-    # Aadhaar format: 12 digits (may contain spaces)
-    aadhaar_pattern = re.compile(r'^[0-9]{12}$')
-    
-    if gst_pattern.match(number):
-        return "GST"
-    elif pan_pattern.match(number):
-        return "PAN"
-    elif aadhaar_pattern.match(number):
-        return "AADHAAR"
-    else:
-        return "INVALID"
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5091))
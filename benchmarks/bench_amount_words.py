@@ -0,0 +1,95 @@
+"""
+Amount-in-words: amount_words against num2words, for speed and for output.
+
+The check compares rupees_in_words(n) with the text the bill used to print,
+num2words(n, lang='en_IN').replace(',', '').title() + " Rupees Only", for
+every n up to --exhaustive and for --samples random amounts of every size
+num2words supports (below 10^10). It exits non-zero on the first mismatch.
+
+    python -m benchmarks.bench_amount_words
+    python -m benchmarks.bench_amount_words --exhaustive 1000000 --samples 200000
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.common import ROOT  # noqa: F401  (puts the repo on sys.path)
+
+import amount_words  # noqa: E402
+
+NUM2WORDS_MAX = 10 ** 10
+
+
+def legacy_words(n):
+    from num2words import num2words
+    return num2words(n, lang='en_IN').replace(',', '').title() + " Rupees Only"
+
+
+def sample_amounts(count, seed=1):
+    """Random amounts spread evenly over 1 to 10 digits."""
+    rng = random.Random(seed)
+    return [rng.randrange(10 ** (d - 1) if d > 1 else 0, 10 ** d) for d in
+            (rng.randint(1, 10) for _ in range(count))]
+
+
+def check(exhaustive, samples):
+    amounts = list(range(exhaustive + 1)) + sample_amounts(samples)
+    for n in amounts:
+        expected = legacy_words(n)
+        got = amount_words.rupees_in_words(n)
+        if got != expected:
+            print(f"MISMATCH {n}: {got!r} != {expected!r}")
+            return False
+    print(f"✅ {len(amounts)} amounts match num2words")
+    return True
+
+
+def per_call_us(fn, amounts):
+    start = time.perf_counter()
+    for n in amounts:
+        fn(n)
+    return (time.perf_counter() - start) / len(amounts) * 1e6
+
+
+def import_ms(module):
+    start = time.perf_counter()
+    __import__(module)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench(n_calls, import_times):
+    amounts = sample_amounts(n_calls, seed=2)
+    # Invoices repeat a few hundred grand totals far more often than not
+    repeated = [amounts[i % 300] for i in range(n_calls)]
+
+    for module, ms in import_times.items():
+        print(f"{module} import: {ms:.1f} ms")
+    print(f"{'converter':<26}{'distinct us/call':>18}{'repeated us/call':>18}")
+    print(f"{'num2words + title()':<26}{per_call_us(legacy_words, amounts):>18.2f}"
+          f"{per_call_us(legacy_words, repeated):>18.2f}")
+    amount_words.number_in_words.cache_clear()
+    distinct = per_call_us(amount_words.rupees_in_words, amounts)
+    amount_words.number_in_words.cache_clear()
+    print(f"{'amount_words':<26}{distinct:>18.2f}"
+          f"{per_call_us(amount_words.rupees_in_words, repeated):>18.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--exhaustive", type=int, default=100000, help="check every amount up to this")
+    parser.add_argument("--samples", type=int, default=50000, help="random amounts below 10^10 to check")
+    parser.add_argument("--calls", type=int, default=20000, help="conversions per benchmark row")
+    args = parser.parse_args()
+
+    # Before anything else imports it
+    import_times = {"num2words": import_ms("num2words")}
+
+    if not check(min(args.exhaustive, NUM2WORDS_MAX - 1), args.samples):
+        sys.exit(1)
+    print()
+    bench(args.calls, import_times)
+
+
+if __name__ == "__main__":
+    main()
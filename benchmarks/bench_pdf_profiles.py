@@ -0,0 +1,46 @@
+"""
+Bytes on the wire and render time per PDF output profile (see pdf_profiles).
+
+"gzip" is what a compressing proxy would send; "1 Mbps ms" is the transfer
+time of the PDF itself on a slow mobile link.
+
+    python -m benchmarks.bench_pdf_profiles [repeat]
+"""
+import contextlib
+import gzip
+import io
+import sys
+
+from benchmarks.common import SAMPLE_BANKS, install_fake_db, sample_invoice, summarize, timed
+
+install_fake_db()
+
+import bill_template  # noqa: E402
+import pdf_profiles  # noqa: E402
+
+LINK_KBPS = 1000
+
+
+def render_once(data, profile):
+    out = io.BytesIO()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bill_template.generate_invoice(data, out, banks=SAMPLE_BANKS, profile=profile)
+    return out.getvalue()
+
+
+def main(repeat=100):
+    print(f"{'profile':<14}{'lines':>6}{'bytes':>10}{'gzip':>10}{'1 Mbps ms':>11}"
+          f"{'p50 ms':>9}{'p99 ms':>9}")
+    for n_items in (8, 100):
+        data = sample_invoice(n_items=n_items)
+        for profile in pdf_profiles.PROFILES:
+            pdf = render_once(data, profile)  # warm-up: fonts
+            stats = summarize(timed(lambda: render_once(data, profile), max(1, repeat * 8 // n_items)))
+            wire_ms = len(pdf) * 8 / LINK_KBPS
+            print(f"{profile:<14}{n_items:>6}{len(pdf):>10}{len(gzip.compress(pdf)):>10}{wire_ms:>11.1f}"
+                  f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,48 @@
+"""
+Per-invoice render time and output size with the page header drawn on every
+page ("direct") or once per document as a form XObject ("form"), and how
+render time scales with the number of lines.
+
+    python -m benchmarks.bench_render [repeat]
+"""
+import contextlib
+import io
+import sys
+
+from benchmarks.common import SAMPLE_BANKS, install_fake_db, sample_invoice, summarize, timed
+
+install_fake_db()
+
+import bill_template  # noqa: E402
+
+
+def render_once(data):
+    out = io.BytesIO()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bill_template.generate_invoice(data, out, banks=SAMPLE_BANKS)
+    return out.getvalue()
+
+
+def main(repeat=200):
+    print(f"{'mode':<8}{'lines':>6}{'inv/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'bytes':>10}")
+    for n_items in (8, 100):
+        data = sample_invoice(n_items=n_items)
+        for mode, forms in (("direct", False), ("form", True)):
+            bill_template.STATIC_FORMS = forms
+            pdf = render_once(data)  # warm-up: fonts, imports
+            stats = summarize(timed(lambda: render_once(data), max(1, repeat * 8 // n_items)))
+            print(f"{mode:<8}{n_items:>6}{stats['ops_per_sec']:>10.1f}"
+                  f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{len(pdf):>10}")
+    bill_template.STATIC_FORMS = True
+
+    print()
+    print(f"{'lines':<8}{'ms':>10}{'ms/line':>10}{'bytes':>10}")
+    for n_items in (15, 100, 250, 1000):
+        data = sample_invoice(n_items=n_items)
+        samples = timed(lambda: render_once(data), max(1, repeat // n_items))
+        ms = summarize(samples)["p50_ms"]
+        print(f"{n_items:<8}{ms:>10.1f}{ms / n_items:>10.3f}{len(render_once(data)):>10}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,142 @@
+"""
+Count Mongo round trips per write operation, before and after batching.
+
+Every collection call that would be a network request (find_one,
+update_one, bulk_write, ...) is counted against the operation that made
+it. The "legacy" rows re-run the previous check-then-insert versions of
+add_pending and add_city for comparison. The estimated latency column
+multiplies the count by --rtt, the typical round trip to Atlas.
+
+    python -m benchmarks.bench_round_trips
+    python -m benchmarks.bench_round_trips --ops 1000 --rtt 40
+"""
+import argparse
+import contextlib
+import io
+
+from benchmarks.common import install_fake_db
+
+fake_db = install_fake_db()
+
+ROUND_TRIP_METHODS = {
+    "find_one", "find", "insert_one", "insert_many", "update_one", "update_many",
+    "delete_one", "delete_many", "bulk_write", "find_one_and_update",
+    "find_one_and_replace", "find_one_and_delete", "aggregate", "count_documents",
+}
+
+
+class CountingCollection:
+    """Proxy that counts the calls which reach the server."""
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in ROUND_TRIP_METHODS:
+            def counted(*args, **kwargs):
+                self._counter["trips"] += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+counter = {"trips": 0}
+fake_db.get_collection = lambda name: CountingCollection(fake_db.db[name], counter)
+
+from data_manager import DatabaseManager  # noqa: E402
+
+
+# ---------- Previous implementations ----------
+def legacy_add_pending(dm, type_, name, gstin="", place=""):
+    key = name.strip()
+    if type_ == "party" and dm.store.parties.find_one({"name": key}):
+        return False
+    if type_ == "transport" and dm.store.transports.find_one({"name": key}):
+        return False
+    if dm.store.pending.find_one({"type": type_, "name": key}):
+        return False
+    dm.store.pending.insert_one({"type": type_, "name": key, "gstin": gstin.strip(),
+                           "place": place.strip() if type_ == "party" else ""})
+    return True
+
+
+def legacy_add_city(dm, city, state):
+    dm.store.cities.update_one(
+        {"city": city.strip(), "state": state.strip()},
+        {"$setOnInsert": {"city": city.strip(), "state": state.strip()}},
+        upsert=True,
+    )
+    return True
+
+
+# ---------- Scenarios ----------
+def reset(dm):
+    for name in ("parties", "transports", "cities", "pending_requests"):
+        fake_db.db[name].delete_many({})
+    fake_db.db.parties.insert_many([{"name": f"PARTY {i:04d}"} for i in range(200)])
+    dm.cache.clear()
+    dm._name_indexes.clear()
+    dm.city_buffer.flush()
+
+
+def count(fn, n_ops, finish=None, prepare=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n_ops if prepare else 0):
+            prepare(i)  # not counted, e.g. the form's own lookups
+    counter["trips"] = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n_ops):
+            fn(i)
+        if finish:
+            finish()  # e.g. write out whatever is still buffered
+    return counter["trips"] / n_ops
+
+
+def run(n_ops, rtt_ms):
+    dm = DatabaseManager()
+    cities = [(f"CITY {i % 40:02d}", "Gujarat") for i in range(n_ops)]  # pickers repeat cities
+
+    scenarios = [
+        ("add_pending new name", "legacy",
+         lambda i: legacy_add_pending(dm, "party", f"NEW {i}")),
+        ("add_pending new name", "current",
+         lambda i: dm.add_pending("party", f"NEW {i}")),
+        # The bill form looks a typed party up (/get_party_details) before
+        # asking to add it, which caches the miss
+        ("add_pending new, looked up", "current",
+         lambda i: dm.add_pending("party", f"NEW {i}")),
+        ("add_pending existing party", "legacy",
+         lambda i: legacy_add_pending(dm, "party", f"PARTY {i % 200:04d}")),
+        ("add_pending existing party", "current",
+         lambda i: dm.add_pending("party", f"PARTY {i % 200:04d}")),
+        ("add_pending already pending", "legacy",
+         lambda i: legacy_add_pending(dm, "transport", "SAME TRANSPORT")),
+        ("add_pending already pending", "current",
+         lambda i: dm.add_pending("transport", "SAME TRANSPORT")),
+        ("add_city", "legacy",
+         lambda i: legacy_add_city(dm, *cities[i])),
+        ("add_city", "current",
+         lambda i: dm.add_city(*cities[i])),
+    ]
+    finish = {"current add_city": dm.flush_cities}
+    prepare = {"current add_pending new, looked up": lambda i: dm.get_party(f"NEW {i}")}
+
+    print(f"{'operation':<30}{'version':>9}{'trips/op':>10}{f'est ms @{rtt_ms:g}ms':>16}")
+    for name, version, fn in scenarios:
+        reset(dm)
+        trips = count(fn, n_ops, finish.get(f"{version} {name}"), prepare.get(f"{version} {name}"))
+        print(f"{name:<30}{version:>9}{trips:>10.3f}{trips * rtt_ms:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=500, help="operations per scenario")
+    parser.add_argument("--rtt", type=float, default=30.0, help="assumed Mongo round trip in ms")
+    args = parser.parse_args()
+    run(args.ops, args.rtt)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Cold-start cost of importing the app, from `python -X importtime`.
+
+Each run imports the module in a fresh interpreter, the way a new worker
+does, and reports the wall time of the import plus the packages that took
+longest (self time summed per top-level package). It also lists the
+heavy modules that should load lazily but were imported anyway.
+
+The real db module is used: importing the app must not need a database,
+so no Mongo settings are required.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --top 20 --module bill_template
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import ROOT
+
+# Loaded on first use (render, first query), never by the import itself
+LAZY_MODULES = ["reportlab", "num2words", "gridfs", "openpyxl", "numpy"]
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)$")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print("wall_ms", elapsed * 1000)
+print("loaded", *sorted(m for m in {lazy!r} if m in sys.modules))
+"""
+
+
+def run_once(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "WARMUP_ON_START": ""},
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    wall_ms, loaded = 0.0, []
+    for line in proc.stdout.splitlines():
+        if line.startswith("wall_ms"):
+            wall_ms = float(line.split()[1])
+        elif line.startswith("loaded"):
+            loaded = line.split()[1:]
+
+    # Self time of every module, summed per top-level package
+    packages = {}
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            name = m.group(2).split(".")[0]
+            packages[name] = packages.get(name, 0) + int(m.group(1)) / 1000
+    return wall_ms, packages, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app", help="module to import (default: app)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    walls = [wall for wall, _, _ in runs]
+    # Per-package time from the median run, so one noisy run doesn't skew it
+    _, packages, loaded = sorted(runs, key=lambda r: r[0])[len(runs) // 2]
+
+    print(f"import {args.module}: median {statistics.median(walls):.1f} ms, "
+          f"min {min(walls):.1f} ms over {len(walls)} runs")
+    print()
+    print(f"{'package':<28}{'self ms':>14}")
+    for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<28}{ms:>14.1f}")
+    print()
+    if loaded:
+        print("⚠️ imported eagerly: " + ", ".join(loaded))
+    else:
+        print("✅ none of " + ", ".join(LAZY_MODULES) + " imported at startup")
+
+
+if __name__ == "__main__":
+    main()
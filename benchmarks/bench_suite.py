@@ -0,0 +1,135 @@
+"""
+Benchmark suite for the hot paths: PDF rendering and the Flask routes.
+
+Runs against an in-process mongomock database seeded with synthetic parties,
+transports, cities and bank details, so no Atlas connection is needed.
+mongomock answers every query with a collection scan, so absolute numbers at
+the larger sizes overstate lookup cost; compare runs against each other.
+
+    python -m benchmarks.bench_suite                  # 100 / 10k / 100k records
+    python -m benchmarks.bench_suite --sizes 100 --repeat 20
+"""
+import argparse
+import contextlib
+import io
+import os
+
+from benchmarks.common import (
+    SAMPLE_BANKS, install_fake_db, measure, print_header, print_row, sample_invoice,
+)
+
+fake_db = install_fake_db()
+
+# Every POST /download must render: with the archive on, repeats of the same
+# payload would be answered from it
+os.environ["INVOICE_ARCHIVE"] = "off"
+
+import app as app_module  # noqa: E402
+import bill_template  # noqa: E402
+
+STATES = ["Gujarat", "Maharashtra", "Rajasthan", "Madhya Pradesh", "Uttar Pradesh", "Tamil Nadu"]
+LINE_ITEMS = [1, 15, 100, 500]
+
+
+def seed(n_records):
+    """Fill the reference collections with n_records synthetic rows each."""
+    # mongomock checks unique indexes with a scan per insert, so load first
+    # and rebuild the indexes afterwards
+    for name in ("parties", "transports", "cities", "pending_requests", "bank_details"):
+        fake_db.get_collection(name).drop()
+
+    fake_db.get_collection("parties").insert_many([
+        {"name": f"PARTY {i:06d} TEXTILES", "gstin": f"24AAACP{i % 10000:04d}A1Z5",
+         "place": "SURAT (G.)", "fixed_place": i % 3 == 0}
+        for i in range(n_records)
+    ])
+    fake_db.get_collection("transports").insert_many([
+        {"name": f"TRANSPORT {i:06d} ROADLINES", "gstin": f"24AAACT{i % 10000:04d}B1Z3"}
+        for i in range(n_records)
+    ])
+    fake_db.get_collection("cities").insert_many([
+        {"city": f"CITY {i:06d}", "state": STATES[i % len(STATES)]}
+        for i in range(n_records)
+    ])
+    fake_db.get_collection("bank_details").insert_many([dict(b) for b in SAMPLE_BANKS])
+    app_module.data_manager._create_indexes()
+    app_module.data_manager.reference_changed()
+
+
+def form_payload(n_items):
+    data = sample_invoice(n_items=n_items)
+    return {
+        "bill_no": data["invoice_no"],
+        "date": "2025-10-01",
+        "customer_name": "PARTY 000001 TEXTILES",
+        "ch_no": data["place"],
+        "gstin": data["party_gstin"],
+        "transport": "TRANSPORT 000001 ROADLINES",
+        "transport_gstin": data["transport_gstin"],
+        "item_name[]": [i["name"] for i in data["items"]],
+        "qty[]": [str(i["qty"]) for i in data["items"]],
+        "unit[]": [i["unit"] for i in data["items"]],
+        "rate[]": [str(i["rate"]) for i in data["items"]],
+    }
+
+
+def quiet(fn):
+    """Wrap fn so the app's progress prints don't end up in the timings."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+def bench_render(repeat):
+    for n_items in LINE_ITEMS:
+        data = sample_invoice(n_items=n_items)
+        runs = max(3, repeat // max(1, n_items // 15))
+        stats = measure(quiet(lambda: bill_template.generate_invoice(
+            data, io.BytesIO(), banks=SAMPLE_BANKS)), runs)
+        print_row(f"generate_invoice {n_items} lines", stats)
+
+
+def bench_routes(n_records, repeat):
+    client = app_module.app.test_client()
+    runs = max(3, repeat if n_records <= 10_000 else repeat // 10)
+
+    def check(response):
+        assert response.status_code == 200, response.status_code
+        return response
+
+    print_row(f"GET / ({n_records} rec)",
+              measure(quiet(lambda: check(client.get("/"))), runs))
+    print_row(f"GET /admin/data parties ({n_records} rec)",
+              measure(quiet(lambda: check(client.get("/admin/data?table=parties"))), runs))
+    print_row(f"GET /search/parties ({n_records} rec)",
+              measure(quiet(lambda: check(client.get("/search/parties?q=party%2000012"))), runs))
+    print_row(f"GET /search/cities ({n_records} rec)",
+              measure(quiet(lambda: check(client.get("/search/cities?q=city%200001"))), runs))
+    print_row(f"GET /get_party_details ({n_records} rec)",
+              measure(quiet(lambda: check(client.get(
+                  "/get_party_details?name=PARTY%20000001%20TEXTILES"))), runs))
+
+    for n_items in LINE_ITEMS:
+        payload = form_payload(n_items)
+        item_runs = max(3, runs // max(1, n_items // 15))
+        print_row(f"POST /download {n_items} lines ({n_records} rec)",
+                  measure(quiet(lambda: check(client.post("/download", data=payload))), item_runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000],
+                        help="number of synthetic records per collection")
+    parser.add_argument("--repeat", type=int, default=50, help="calls per scenario")
+    args = parser.parse_args()
+
+    print_header()
+    bench_render(args.repeat)
+    for n_records in args.sizes:
+        seed(n_records)
+        bench_routes(n_records, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
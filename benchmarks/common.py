@@ -0,0 +1,117 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks never talk to Atlas: install_fake_db() swaps the `db` module for an
+in-process mongomock database (pip install mongomock) before the app modules
+are imported. Run the scripts from the repository root, e.g.
+
+    python -m benchmarks.bench_render
+"""
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SAMPLE_BANKS = [
+    {"bank_name": "STATE BANK OF INDIA", "account_number": "30112233445", "ifsc": "SBIN0001234"},
+    {"bank_name": "HDFC BANK", "account_number": "50100123456789", "ifsc": "HDFC0000123"},
+]
+
+ITEM_NAMES = ["CITRA", "COTTON", "HI CHOICE", "KING COTTON", "LINEN", "MAGIC", "PRINT", "SAFARI"]
+
+
+def install_fake_db():
+    """Replace the `db` module with a mongomock-backed one and return it."""
+    import mongomock
+
+    fake = types.ModuleType("db")
+    fake.client = mongomock.MongoClient()
+    fake.db = fake.client["bill_app"]
+    fake.get_client = lambda: fake.client
+    fake.get_db = lambda: fake.db
+    fake.get_collection = lambda name: fake.db[name]
+    fake.reset_client = fake.close_client = lambda: None
+    sys.modules["db"] = fake
+    return fake
+
+
+def sample_invoice(n_items=5, invoice_no="1001"):
+    """Invoice payload in the shape generate_invoice expects."""
+    return {
+        "invoice_no": invoice_no,
+        "date": "01/10/2025",
+        "party_name": "SHREE GANESH TEXTILES",
+        "place": "AHMEDABAD (G.)",
+        "party_gstin": "24AAACS1234A1Z8",
+        "transport": "VRL LOGISTICS",
+        "transport_gstin": "29AABCV3609C1ZJ",
+        "items": [
+            {
+                "name": ITEM_NAMES[i % len(ITEM_NAMES)],
+                "qty": 10 + i * 1.25,
+                "unit": "Mtr",
+                "rate": 95.5 + i,
+            }
+            for i in range(n_items)
+        ],
+    }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def timed(fn, repeat):
+    """Call fn() `repeat` times and return the per-call latencies in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    total = sum(samples)
+    return {
+        "calls": len(samples),
+        "ops_per_sec": len(samples) / total if total else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+def peak_memory_kb(fn):
+    """Peak Python heap allocated during one call of fn(), in KiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, repeat):
+    """Latency summary over `repeat` calls plus the peak memory of one extra call."""
+    fn()  # warm-up
+    stats = summarize(timed(fn, repeat))
+    stats["peak_kb"] = peak_memory_kb(fn)
+    return stats
+
+
+def print_header():
+    print(f"{'scenario':<42}{'calls':>7}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>11}")
+
+
+def print_row(name, stats):
+    print(f"{name:<42}{stats['calls']:>7}{stats['ops_per_sec']:>10.1f}{stats['p50_ms']:>10.2f}"
+          f"{stats['p99_ms']:>10.2f}{stats['peak_kb']:>11.0f}")
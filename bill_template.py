@@ -1,11 +1,18 @@
-import re
+import io, os, re
+from contextlib import nullcontext
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib.units import mm
-from num2words import num2words  # pip install num2words
-from db import get_collection
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+import amount_words
+import invoice_math
+import pdf_profiles
+from metrics import span, timed_phase
+from storage import PHASE as STORAGE_PHASE, get_storage
 
 def sanitize_string(s):
     """
@@ -21,12 +28,77 @@ def sanitize_string(s):
     s = " ".join(s.split())
     return s
 
+_storage = None
+
+
+@timed_phase(STORAGE_PHASE)
 def get_bank_details():
-    col = get_collection("bank_details")  # ← pass the name here
-    return list(col.find({}, {"_id": 0}))
+    global _storage
+    if _storage is None:
+        _storage = get_storage()
+    return _storage.rows("bank_details")
+
+# ===== OUTPUT PROFILES =====
+# The layout is written in base-14 Helvetica; profiles that embed fonts draw
+# it in these TrueType fonts instead (subset into each PDF by ReportLab).
+# Vera runs wider than Helvetica (about 7%, 18% in bold), so it is drawn
+# smaller by that much to keep text inside the fixed columns.
+EMBEDDED_FONTS = {
+    "Helvetica": ("Vera", "Vera.ttf", 0.93),
+    "Helvetica-Bold": ("VeraBd", "VeraBd.ttf", 0.85),
+}
+
+_embedded_font_map = None
+
+
+def _embedded_fonts():
+    """{base-14 name: (TrueType name, size scale)}, registering the fonts once."""
+    global _embedded_font_map
+    if _embedded_font_map is None:
+        for name, path, _ in EMBEDDED_FONTS.values():
+            pdfmetrics.registerFont(TTFont(name, path))
+        _embedded_font_map = {base: (name, scale) for base, (name, _, scale) in EMBEDDED_FONTS.items()}
+    return _embedded_font_map
+
+
+class InvoiceCanvas(canvas.Canvas):
+    """A4 canvas set up for one output profile (see pdf_profiles)."""
+
+    def __init__(self, filename, profile=None, title=None):
+        settings = pdf_profiles.get_profile(profile)
+        self.font_map = _embedded_fonts() if settings["embed_fonts"] else {}
+        extra = {"enforceColorSpace": "rgb", "lang": "en-IN"} if settings["archival"] else {}
+        initial_font = self.font_map.get("Helvetica", ("Helvetica", 1))[0]
+        super().__init__(filename, pagesize=A4, pageCompression=int(settings["compress"]),
+                         initialFontName=initial_font, **extra)
+        if settings["archival"]:
+            self.setTitle(title or "Tax Invoice")
+            self.setAuthor("ANANT CREATION")
+            self.setSubject("Tax Invoice")
+            self.setCreator("bill-generator")
+
+    def setFont(self, psfontname, size, leading=None):
+        # Tables and draw calls name Helvetica; swap in the embedded font
+        if psfontname in self.font_map:
+            psfontname, scale = self.font_map[psfontname]
+            size *= scale
+        super().setFont(psfontname, size, leading)
+
+
+# ===== STATIC BLOCKS =====
+# Set to False to draw the page header straight onto every page (used by benchmarks)
+STATIC_FORMS = True
+
+TERMS = [
+    "1. Goods once sold will not be taken back.",
+    "2. Any complaint should be made within 7 days of receipt of goods.",
+    "3. Interest @24% p.a. will be charged if payment is not made within due date.",
+    "4. Subject to Surat Jurisdiction only.",
+    "5. Please issue A/c Payee Cheque only."
+]
 
-def generate_invoice(data, filename="invoice_fixed.pdf"):
-    c = canvas.Canvas(filename, pagesize=A4)
+def _draw_page_header(c):
+    """Outer border, company header, party field labels and separator lines."""
     width, height = A4
 
     # ===== OUTER BORDER =====
@@ -44,12 +116,116 @@ def generate_invoice(data, filename="invoice_fixed.pdf"):
     c.drawString(35, height - 74, "1048-49, Shree Mahalaxmi Market, Ring Road, Surat-395002")
     c.drawString(35, height - 88, "GSTIN: 24AHJPR6707K1ZY    MO: 9377178174")
 
+    # Line under header
+    c.line(30, height - 95, width - 30, height - 95)
+
+    # ===== PARTY DETAIL LABELS =====
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(35, height - 110, "Party's Name:")
+    c.drawString(300, height - 110, "Transport:")
+    c.drawString(35, height - 122, "Place:")
+    c.drawString(300, height - 122, "Transport GSTIN:")
+    c.drawString(35, height - 134, "GSTIN No:")
+
+    # Line under party details
+    c.line(30, height - 139, width - 30, height - 139)
+
+
+def _draw_terms(c):
+    """Terms & conditions, with the heading baseline at y = 0."""
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(35, 0, "Terms & Conditions:")
+    c.setFont("Helvetica", 9)
+    y_offset = -12
+    for t in TERMS:
+        c.drawString(45, y_offset, t)
+        y_offset -= 10
+
+
+def _draw_signature(c):
+    """Signature block, with the first baseline at y = 0."""
+    c.setFont("Helvetica-Bold", 9)
+    c.drawRightString(550, 0, "For ANANT CREATION")
+    c.setFont("Helvetica", 9)
+    c.drawRightString(550, -15, "Authorised Signatory")
+
+
+def _draw_at(c, draw, y=0):
+    """Draw a static block on the current page, shifted up by y."""
+    c.saveState()
+    c.translate(0, y)
+    draw(c)
+    c.restoreState()
+
+
+def _draw_form(c, name, draw):
+    """
+    Draw a block that repeats on every page of a multi-page invoice. It is
+    drawn once per document into a form XObject, which each page then
+    references with doForm.
+    """
+    if not STATIC_FORMS:
+        _draw_at(c, draw)
+        return
+    if not c.hasForm(name):
+        c.beginForm(name)
+        draw(c)
+        c.endForm()
+    c.doForm(name)
+
+
+# ===== PAGINATION =====
+ITEM_HEADER = ["Item", "HSN/SAC", "Qty", "Unit", "Rate", "Amount"]
+COL_WIDTHS = [150, 70, 60, 60, 80, 85]
+
+# Item rows on the last page (above the totals), including the brought-forward
+# row, when there is one tax row; each further tax row (CGST + SGST) takes one
+LAST_PAGE_ROWS = 15
+# Item rows on every other page, between the brought/carried-forward rows
+PAGE_ROWS = 32
+
+
+def paginate_items(items, tax_rows=1):
+    """
+    Split items into pages, yielding (page_items, is_last). tax_rows is the
+    number of GST rows in the totals block, which shares the last page.
+    Every page but the last is filled up to PAGE_ROWS. Rows go on the last
+    page only if they fit above the totals block; otherwise they stay on a
+    regular page and the totals get a page of their own. Reads the items
+    lazily and holds at most one page plus one row.
+    """
+    buf = []
+    pages = 0
+    for item in items:
+        buf.append(item)
+        if len(buf) > PAGE_ROWS:
+            yield buf[:PAGE_ROWS], False
+            buf = buf[PAGE_ROWS:]
+            pages += 1
+
+    # Pages after the first lose one row to "Brought Forward"
+    if len(buf) > LAST_PAGE_ROWS + 1 - tax_rows - (1 if pages else 0):
+        yield buf, False
+        buf = []
+    yield buf, True
+
+
+def _draw_page_top(c, data, page_no):
+    """Static header plus the invoice and party fields, repeated on every page."""
+    width, height = A4
+
+    # ===== BORDER, HEADER, LABELS =====
+    # A form only pays off once it is reused; single-page bills draw directly
+    if page_no:
+        _draw_form(c, "page_header", _draw_page_header)
+    else:
+        _draw_at(c, _draw_page_header)
+
     c.setFont("Helvetica-Bold", 9)
     c.drawRightString(width - 35, height - 60, f"Invoice No: {data['invoice_no']}")
     c.drawRightString(width - 35, height - 74, f"Date: {data['date']}")
-
-    # Line under header
-    c.line(30, height - 95, width - 30, height - 95)
+    if page_no:
+        c.drawRightString(width - 35, height - 88, f"Page: {page_no}")
 
     # ===== PARTY DETAILS (✅ Party Name Capitalized) =====
     y = height - 110
@@ -62,73 +238,26 @@ def generate_invoice(data, filename="invoice_fixed.pdf"):
     party_gstin = data.get("party_gstin", "")
     transport_gstin = data.get("transport_gstin", "") 
 
-    # --- Row 1 ---
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(35, y, "Party's Name:")
     c.setFont("Helvetica", 9)
+    # --- Row 1 ---
     c.drawString(110, y, party_name) # <- sanitized and capitalized
-
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(300, y, "Transport:")
-    c.setFont("Helvetica", 9)
     c.drawString(365, y, transport) # <- sanitized
 
     # --- Row 2 ---
     y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(35, y, "Place:")
-    c.setFont("Helvetica", 9)
     c.drawString(110, y, place) # <- sanitized
-
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(300, y, "Transport GSTIN:")
-    c.setFont("Helvetica", 9)
     c.drawString(385, y, transport_gstin) 
 
     # --- Row 3 ---
     y -= 12
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(35, y, "GSTIN No:")
-    c.setFont("Helvetica", 9)
     c.drawString(110, y, party_gstin)
 
-    # Draw line under party details
-    c.line(30, y - 5, width - 30, y - 5)
-
-    # ===== ITEM TABLE =====
-    table_data = [["Item", "HSN/SAC", "Qty", "Unit", "Rate", "Amount"]]
-    total = 0
-    for item in data["items"]:
-        amount = item["qty"] * item["rate"]
-        total += amount
-        table_data.append([
-            item["name"],
-            "5407",
-            f"{item['qty']:.2f}",
-            item["unit"],
-            f"{item['rate']:.2f}",
-            f"{amount:.2f}"
-        ])
-
-    # Pad to 15 item rows (excluding header)
-    while len(table_data) < 16:
-        table_data.append(["", "", "", "", "", ""])
-
-    rounded_total = round(total)
+    return y
 
-    gst = rounded_total * 0.05
-    grand_total = rounded_total + gst
 
-    # Add totals as last 3 rows in the table
-    table_data.append(["", "", "", "", "Total", f"{rounded_total:.2f}"])
-    table_data.append(["", "", "", "", "Add IGST @5%", f"{gst:.2f}"])
-    table_data.append(["", "", "", "", "Grand Total", f"{grand_total:.2f}"])
-
-    col_widths = [150, 70, 60, 60, 80, 85] 
-    table = Table(table_data, colWidths=col_widths)
-
-    n = len(table_data)
-    style = TableStyle([
+def _item_table_style(n, footer_rows):
+    """Column rules for an n-row item table whose last footer_rows rows are bold."""
+    return TableStyle([
         ('GRID', (0, 0), (-1, 0), 0.6, colors.black),
         ('BOX', (0, 0), (-1, n - 1), 0.6, colors.black),
         ('LINEBEFORE', (1, 0), (1, n - 1), 0.6, colors.black),
@@ -136,24 +265,87 @@ def generate_invoice(data, filename="invoice_fixed.pdf"):
         ('LINEBEFORE', (3, 0), (3, n - 1), 0.6, colors.black),
         ('LINEBEFORE', (4, 0), (4, n - 1), 0.6, colors.black),
         ('LINEBEFORE', (5, 0), (5, n - 1), 0.6, colors.black),
-        ('LINEABOVE', (0, n - 3), (-1, n - 3), 0.6, colors.black),
+        ('LINEABOVE', (0, n - footer_rows), (-1, n - footer_rows), 0.6, colors.black),
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
         ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
         ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (4, n - 3), (5, n - 1), 'Helvetica-Bold'),
+        ('FONTNAME', (4, n - footer_rows), (5, n - 1), 'Helvetica-Bold'),
         ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
         ('LINEBELOW', (0, n - 1), (-1, n - 1), 0.6, colors.black),
     ])
-    table.setStyle(style)
 
+
+def generate_invoice(data, filename="invoice_fixed.pdf", banks=None, profile=None):
+    """Draw the invoice into filename (a path or file object) using a PDF profile."""
+    c = InvoiceCanvas(filename, profile, title=f"Tax Invoice {data['invoice_no']}")
+    width, height = A4
     table_x = 30
+
+    # ===== ITEM PAGES =====
+    # Rows are laid out one page at a time; every finished page is handed to
+    # the canvas with showPage() and its table is dropped.
+    total = 0  # running subtotal in paise
+    page_no = 0
+    gst_mode = invoice_math.gst_mode_for(data["party_gstin"])
+    tax_rows = len(invoice_math.tax_lines(0, gst_mode))
+    for page_items, is_last in paginate_items(data["items"], tax_rows):
+        multi_page = page_no > 0 or not is_last
+        page_no += 1
+        y = _draw_page_top(c, data, page_no if multi_page else None)
+
+        table_data = [ITEM_HEADER]
+        if page_no > 1:
+            table_data.append(["Brought Forward", "", "", "", "", invoice_math.format_paise(total)])
+
+        for item in page_items:
+            amount = invoice_math.line_paise(item["qty"], item["rate"])
+            total += amount
+            table_data.append([
+                item["name"],
+                "5407",
+                invoice_math.format_qty(item["qty"]),
+                item["unit"],
+                invoice_math.format_paise(invoice_math.scaled(item["rate"], 100)),
+                invoice_math.format_paise(amount)
+            ])
+
+        if not is_last:
+            table_data.append(["Carried Forward", "", "", "", "", invoice_math.format_paise(total)])
+            table = Table(table_data, colWidths=COL_WIDTHS)
+            table.setStyle(_item_table_style(len(table_data), 1))
+            _, table_height = table.wrapOn(c, width, height)
+            table.drawOn(c, table_x, y - 20 - table_height)
+
+            c.setFont("Helvetica", 8)
+            c.drawRightString(width - 35, 28, "Continued on next page...")
+            c.showPage()
+
+    # ===== LAST PAGE: TOTALS =====
+    totals = invoice_math.totals_from_paise(total, gst_mode)
+    taxes = totals["taxes"]
+
+    # Pad to LAST_PAGE_ROWS item rows (excluding header), less one per extra
+    # tax row, so the table keeps its height whatever the GST mode
+    while len(table_data) < LAST_PAGE_ROWS + 2 - len(taxes):
+        table_data.append(["", "", "", "", "", ""])
+
+    # Add totals as the last rows in the table
+    table_data.append(["", "", "", "", "Total", invoice_math.format_paise(totals["taxable_paise"])])
+    for label, paise in taxes:
+        table_data.append(["", "", "", "", label, invoice_math.format_paise(paise)])
+    table_data.append(["", "", "", "", "Grand Total", invoice_math.format_paise(totals["grand_total_paise"])])
+
+    table = Table(table_data, colWidths=COL_WIDTHS)
+    table.setStyle(_item_table_style(len(table_data), 2 + len(taxes)))
+
     table_y = y - 20 
     table.wrapOn(c, width, height)
     _, table_height = table.wrap(0, 0)
     table.drawOn(c, table_x, table_y - table_height)
 
     # ===== GRAND TOTAL IN WORDS =====
-    grand_total_words = num2words(round(grand_total), lang='en_IN').replace(',', '').title() + " Rupees Only"
+    with span("amount_words"):
+        grand_total_words = amount_words.amount_in_words(totals["grand_total_paise"], with_paise=False)
     words_table_data = [["Grand Total (in Words)", grand_total_words]]
     words_table = Table(words_table_data, colWidths=[150, 355])
     words_table.setStyle(TableStyle([
@@ -168,26 +360,15 @@ def generate_invoice(data, filename="invoice_fixed.pdf"):
     words_table.drawOn(c, table_x, table_y - table_height - words_table_height - 5)
     
     # ===== TERMS & CONDITIONS =====
-    terms = [
-        "1. Goods once sold will not be taken back.",
-        "2. Any complaint should be made within 7 days of receipt of goods.",
-        "3. Interest @24% p.a. will be charged if payment is not made within due date.",
-        "4. Subject to Surat Jurisdiction only.",
-        "5. Please issue A/c Payee Cheque only."
-    ]
     section_y = table_y - table_height - words_table_height - 40
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(35, section_y, "Terms & Conditions:")
-    c.setFont("Helvetica", 9)
-    y_offset = section_y - 12
-    for t in terms:
-        c.drawString(45, y_offset, t)
-        y_offset -= 10
+    _draw_at(c, _draw_terms, section_y)
+    y_offset = section_y - 12 - 10 * len(TERMS)
 
     bank_section_y = y_offset - 20
 
     # ===== BANK DETAILS =====
-    banks = get_bank_details()
+    if banks is None:
+        banks = get_bank_details()
     if banks:
         c.setFont("Helvetica-Bold", 9)
         c.drawString(35, bank_section_y, "Bank Details:")
@@ -217,12 +398,69 @@ def generate_invoice(data, filename="invoice_fixed.pdf"):
     sig_y -= 40
 
     # ===== SIGNATURE SECTION =====
-    c.setFont("Helvetica-Bold", 9)
-    c.drawRightString(550, sig_y, "For ANANT CREATION")
-    c.setFont("Helvetica", 9)
-    c.drawRightString(550, sig_y - 15, "Authorised Signatory")
+    _draw_at(c, _draw_signature, sig_y)
 
     c.save()
     print(f"✅ Invoice generated successfully: {filename}")
 
-    return total
+    return invoice_math.rupees(total)
+
+
+# ===== BATCH RENDERING =====
+def render_invoice_pdf(data, banks=None, profile=None):
+    """Render one invoice into memory and return (pdf_bytes, total)."""
+    output = io.BytesIO()
+    total = generate_invoice(data, output, banks=banks, profile=profile)
+    return output.getvalue(), total
+
+
+def generate_invoices_batch(invoices, max_workers=None, banks=None, profile=None, pool=None):
+    """
+    Render many invoices on a process pool.
+    Yields (data, pdf_bytes, total, error) in completion order, so callers can
+    write each PDF out as soon as it is ready. At most 2 * max_workers jobs
+    are in flight at once, which keeps memory flat for any batch size.
+    pool is a long-lived executor of max_workers processes to render on;
+    without one, a pool is started for this batch and shut down after it.
+    """
+    # Bank details are read once here: worker processes must not touch Mongo
+    if banks is None:
+        banks = get_bank_details()
+
+    max_workers = max_workers or os.cpu_count() or 1
+    limit = 2 * max_workers
+
+    with (nullcontext(pool) if pool else ProcessPoolExecutor(max_workers=max_workers)) as pool:
+        pending = {}
+        invoices = iter(invoices)
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < limit:
+                    try:
+                        data = next(invoices)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    try:
+                        pending[pool.submit(render_invoice_pdf, data, banks, profile)] = data
+                    except BrokenExecutor as e:
+                        yield data, None, None, e
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    data = pending.pop(future)
+                    try:
+                        pdf_bytes, total = future.result()
+                    except Exception as e:
+                        yield data, None, None, e
+                    else:
+                        yield data, pdf_bytes, total, None
+        finally:
+            # A shared pool outlives an abandoned batch (e.g. the client left)
+            for future in pending:
+                future.cancel()
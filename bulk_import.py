@@ -0,0 +1,187 @@
+"""
+Bulk import of parties, transports and cities from CSV or XLSX.
+
+Rows are read one at a time (XLSX through openpyxl's read-only mode, if
+installed), validated, and written in batches of unordered bulk_write
+upserts built by the same helpers add_party/add_transport/add_city use.
+Re-importing a file therefore updates rows instead of duplicating them.
+
+    python bulk_import.py parties parties.csv
+    python bulk_import.py cities cities.xlsx --batch-size 5000 --dry-run
+"""
+import argparse
+import codecs
+import csv
+import os
+import re
+import sys
+
+from data_manager import city_upsert, party_upsert, transport_upsert
+from gst_validation import validate
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# Header spellings seen in exported sheets -> field name
+HEADER_ALIASES = {
+    "party": "name", "party_name": "name", "transport_name": "name",
+    "gst": "gstin", "gst_no": "gstin", "gstin_no": "gstin", "gst_number": "gstin",
+    "city_name": "city", "state_name": "state",
+    "fixed": "fixed_place",
+}
+
+TABLE_FIELDS = {
+    "parties": ["name", "gstin", "place", "fixed_place"],
+    "transports": ["name", "gstin"],
+    "cities": ["city", "state"],
+}
+
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+
+
+# ---------- Reading ----------
+def _normalize_header(header):
+    key = re.sub(r"[^a-z0-9]+", "_", str(header or "").strip().lower()).strip("_")
+    return HEADER_ALIASES.get(key, key)
+
+
+def _iter_csv(stream):
+    # Decoded line by line: TextIOWrapper needs readable(), which werkzeug's
+    # SpooledTemporaryFile uploads lack before Python 3.11
+    reader = csv.reader(codecs.iterdecode(stream, "utf-8-sig"))
+    header = [_normalize_header(h) for h in next(reader, [])]
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def _iter_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import needs openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_normalize_header(h) for h in next(rows, [])]
+        for values in rows:
+            yield {k: "" if v is None else str(v) for k, v in zip(header, values)}
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Yield each data row of a CSV/XLSX file as a dict keyed by field name."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_xlsx(stream)
+    if ext in (".csv", ".txt", ""):
+        return _iter_csv(stream)
+    raise ValueError(f"Unsupported file type: {ext}")
+
+
+# ---------- Validation ----------
+def _clean_id(value):
+    """GSTIN (checksum verified), PAN or Aadhaar, normalized; blank is allowed."""
+    if not str(value or "").strip():
+        return ""
+    result = validate(value)
+    if not result.valid:
+        raise ValueError(f"invalid GSTIN/PAN {result.value}: {result.error}")
+    return result.value
+
+
+def validate_row(table, row):
+    """Turn one row into a (filter, update) upsert, or raise ValueError."""
+    row = {k: str(v).strip() for k, v in row.items() if k}
+
+    if table == "parties":
+        if not row.get("name"):
+            raise ValueError("name is required")
+        fixed = row.get("fixed_place", "").lower() in TRUE_VALUES
+        return party_upsert(row["name"], _clean_id(row.get("gstin")), row.get("place", ""), fixed)
+
+    if table == "transports":
+        if not row.get("name"):
+            raise ValueError("name is required")
+        return transport_upsert(row["name"], _clean_id(row.get("gstin")))
+
+    if table == "cities":
+        if not row.get("city") or not row.get("state"):
+            raise ValueError("city and state are required")
+        return city_upsert(row["city"], row["state"])
+
+    raise ValueError(f"Unknown table: {table}")
+
+
+# ---------- Import ----------
+def import_rows(data_manager, table, rows, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Validate and upsert rows in batches. Row numbers in the report count the
+    header as row 1, so they match what a spreadsheet shows.
+    """
+    if table not in TABLE_FIELDS:
+        raise ValueError(f"Unknown table: {table}")
+
+    report = {"table": table, "rows": 0, "inserted": 0, "matched": 0, "failed": 0, "errors": []}
+
+    def add_error(row_no, message):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_no, "error": message})
+
+    def flush(batch):
+        if dry_run or not batch:
+            return
+        inserted, matched, errors = data_manager.bulk_upsert(table, [op for _, op in batch])
+        report["inserted"] += inserted
+        report["matched"] += matched
+        for index, message in sorted(errors.items()):
+            add_error(batch[index][0], message)
+
+    batch = []
+    for row_no, row in enumerate(rows, 2):
+        if not any(str(v).strip() for v in row.values()):
+            continue  # blank line
+        report["rows"] += 1
+        try:
+            batch.append((row_no, validate_row(table, row)))
+        except ValueError as e:
+            add_error(row_no, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
+
+
+def import_file(data_manager, table, stream, filename, batch_size=BATCH_SIZE, dry_run=False):
+    return import_rows(data_manager, table, read_rows(stream, filename), batch_size, dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import parties, transports or cities.")
+    parser.add_argument("table", choices=sorted(TABLE_FIELDS))
+    parser.add_argument("path", help="CSV or XLSX file; the first row holds the column names")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = parser.parse_args()
+
+    from data_manager import DatabaseManager
+
+    with open(args.path, "rb") as f:
+        report = import_file(DatabaseManager(), args.table, f, args.path, args.batch_size, args.dry_run)
+
+    for err in report["errors"]:
+        print(f"row {err['row']}: {err['error']}")
+    print(f"✅ {report['rows']} rows read: {report['inserted']} inserted, "
+          f"{report['matched']} already present, {report['failed']} failed"
+          + (" (dry run)" if args.dry_run else ""))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
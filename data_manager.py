@@ -1,51 +1,254 @@
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from functools import cached_property, lru_cache
 from db import get_collection
-from pymongo import ASCENDING
-from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+import invoice_math
+from metrics import timed_phase
+from name_index import PrefixIndex
+from reference_cache import ReferenceCache, VersionWatch
+from storage import PHASE as STORAGE_PHASE, get_storage
+from write_buffer import WriteBehindBuffer
+
+# Typeahead indexes are rebuilt from storage after this many seconds, which is
+# how long another worker's writes can take to show up in this one
+NAME_INDEX_TTL = float(os.environ.get("NAME_INDEX_TTL", 300))
+
+# Cities picked in the form are written in batches of this size, or after
+# this many seconds, whichever comes first
+CITY_FLUSH_SIZE = int(os.environ.get("CITY_FLUSH_SIZE", 50))
+CITY_FLUSH_SECONDS = float(os.environ.get("CITY_FLUSH_SECONDS", 5))
+
+# Set when indexes are created out of band (python data_manager.py
+# --create-indexes in the deploy step), so workers never issue create_index
+SKIP_INDEX_SETUP = os.environ.get("SKIP_INDEX_SETUP", "").lower() in ("1", "true", "yes")
+
+
+# ------------------ Upsert builders ------------------
+# (filter, update) pairs shared by the single-record add_* methods and the
+# bulk importer, so both write reference data exactly the same way.
+def party_upsert(name, gstin="", place="", fixed_place=False):
+    return (
+        {"name": name.strip()},
+        {"$set": {"gstin": gstin.strip(), "place": place.strip(), "fixed_place": bool(fixed_place)}},
+    )
+
+
+def transport_upsert(name, gstin=""):
+    return {"name": name.strip()}, {"$set": {"gstin": gstin.strip()}}
+
+
+def city_upsert(city, state):
+    return (
+        {"city": city.strip(), "state": state.strip()},
+        {"$setOnInsert": {"city": city.strip(), "state": state.strip()}},
+    )
+
+
+# ------------------ City labels ------------------
+# Cities are shown as "City (S.T.)", with the state's initials
+@lru_cache(maxsize=None)
+def state_abbrev(state):
+    return "".join(w[0].upper() + "." for w in state.split())
+
+
+def city_label(city, state):
+    return f"{city} ({state_abbrev(state)})"
+
+
+# Mongo indexes per collection, as (keys, options)
+COLLECTION_INDEXES = {
+    "invoices": [
+        # Bill numbers restart every financial year
+        ([("invoice_no", ASCENDING), ("fy", ASCENDING)], {"unique": True}),
+        ([("invoice_date", DESCENDING)], {}),
+        ([("party_name", ASCENDING), ("invoice_date", DESCENDING)], {}),
+        ([("party_gstin", ASCENDING), ("invoice_date", ASCENDING)], {}),
+    ],
+    "invoice_rollups": [
+        ([("scope", ASCENDING), ("month", ASCENDING), ("party", ASCENDING)], {"unique": True}),
+    ],
+}
+
+
+class _Collection:
+    """
+    A DatabaseManager collection, looked up on first access (so creating a
+    manager opens no connection). The first lookup also sets up its indexes.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __set_name__(self, owner, attr):
+        self.attr = attr
+
+    def __get__(self, manager, owner=None):
+        if manager is None:
+            return self
+        collection = get_collection(self.name)
+        manager._setup_indexes(self.name, lambda: create_collection_indexes(collection, self.name))
+        manager.__dict__[self.attr] = collection
+        return collection
+
+
+def create_collection_indexes(collection, name):
+    if name == "invoices":
+        _upgrade_invoices(collection)
+    for keys, options in COLLECTION_INDEXES[name]:
+        collection.create_index(keys, **options)
+
+
+def financial_year(date):
+    """Indian financial year (April to March) of a date, e.g. "2025-26"."""
+    if date is None:
+        return None
+    start = date.year if date.month >= 4 else date.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+
+def _upgrade_invoices(collection):
+    """Invoices were once unique on invoice_no alone: drop that index and fill in fy."""
+    if "invoice_no_1" in collection.index_information():
+        collection.drop_index("invoice_no_1")
+    ops = []
+    for doc in collection.find({"fy": {"$exists": False}}, {"invoice_date": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"fy": financial_year(doc.get("invoice_date"))}}))
+        if len(ops) == 1000:
+            collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+
 
 class DatabaseManager:
-    def __init__(self):
-        self.parties   = get_collection("parties")
-        self.transports = get_collection("transports")
-        self.cities    = get_collection("cities")
-        self.pending   = get_collection("pending_requests")
+    """
+    Reference data and pending requests live in the storage backend chosen by
+    STORAGE_BACKEND (see storage.py); invoices and their rollups in Mongo.
+    """
+    invoices   = _Collection("invoices")
+    rollups    = _Collection("invoice_rollups")
+
+    def __init__(self, create_indexes=None, store=None):
+        self._store = store or get_storage()
+        self._name_indexes = {}  # "parties" / "transports" / "cities" -> PrefixIndex
+        self.cache = ReferenceCache()
+        self.city_buffer = WriteBehindBuffer(self._write_cities, CITY_FLUSH_SIZE, CITY_FLUSH_SECONDS)
+
+        # Index setup runs on first access, separately for the storage backend
+        # and each Mongo collection (so a SQLite-only lookup never reaches
+        # Mongo), unless turned off, e.g. when a deploy step already ran it
+        if create_indexes is None:
+            create_indexes = not SKIP_INDEX_SETUP
+        self._create_indexes_on_access = create_indexes
+        self._indexes_ready = set()  # "store" and collection names
 
-        self._create_indexes()
+    @property
+    def store(self):
+        self._setup_indexes("store", self._store.ensure_indexes)
+        return self._store
+
+    @cached_property
+    def version(self):
+        return VersionWatch(self.store)
+
+    def reset_connections(self):
+        """
+        Drop collection handles bound to another process's client; call in a
+        forked worker together with db.reset_client(). Cached reference data
+        is dropped too, since the worker cannot tell how old it is.
+        """
+        for attr, value in vars(type(self)).items():
+            if isinstance(value, _Collection):
+                self.__dict__.pop(attr, None)
+        self.__dict__.pop("version", None)
+        self._store.reset()
+        self.cache.clear()
 
     # ------------------ Indexes ------------------
+    def _setup_indexes(self, name, create):
+        if not self._create_indexes_on_access or name in self._indexes_ready:
+            return
+        self._indexes_ready.add(name)
+        try:
+            create()
+        except Exception:
+            self._indexes_ready.discard(name)  # retried on next access
+            raise
+
+    def ensure_indexes(self):
+        """Set up every index now rather than on first access."""
+        self._setup_indexes("store", self._store.ensure_indexes)
+        for name in COLLECTION_INDEXES:
+            self._setup_indexes(name, lambda: create_collection_indexes(get_collection(name), name))
+
     def _create_indexes(self):
-        self.parties.create_index([("name", ASCENDING)], unique=True)
-        self.transports.create_index([("name", ASCENDING)], unique=True)
-        self.cities.create_index(
-            [("city", ASCENDING), ("state", ASCENDING)], unique=True
-        )
-        self.pending.create_index(
-            [("type", ASCENDING), ("name", ASCENDING)], unique=True
-        )
+        """Create all indexes unconditionally (e.g. after collections were dropped)."""
+        self._store.ensure_indexes()
+        for name in COLLECTION_INDEXES:
+            create_collection_indexes(get_collection(name), name)
 
     # ------------------ Helpers ------------------
     def _norm(self, name):
         return name.strip().upper() if isinstance(name, str) else ""
 
+    # ------------------ Reference cache ------------------
+    def _check_version(self):
+        """Drop cached reference data if another worker has written since."""
+        if self.version.changed():
+            self.cache.clear()
+            for index in self._name_indexes.values():
+                index.built = 0  # rebuild on next search
+
+    def _cached(self, key, load):
+        self._check_version()
+        return self.cache.get_or_load(key, load)
+
+    def data_version(self):
+        """Current reference-data version; changes after every write."""
+        self._check_version()
+        return self.version.version
+
+    def reference_changed(self):
+        """Call after any write to parties, transports or bank details."""
+        self.cache.clear()
+        self.version.bump()
+
+    def cache_metrics(self):
+        """Prometheus lines for the cache counters (see metrics.register_collector)."""
+        stats = self.cache.stats()
+        lines = []
+        for name, help_text in (
+            ("hits", "Reference cache lookups served from memory."),
+            ("misses", "Reference cache lookups that went to Mongo."),
+            ("evictions", "Reference cache entries evicted by size."),
+            ("invalidations", "Reference cache flushes after a write."),
+        ):
+            lines += [
+                f"# HELP bill_reference_cache_{name}_total {help_text}",
+                f"# TYPE bill_reference_cache_{name}_total counter",
+                f"bill_reference_cache_{name}_total {stats[name]}",
+            ]
+        return lines
+
     # ------------------ Parties ------------------
+    @timed_phase(STORAGE_PHASE)
     def add_party(self, name, gstin="", place="", fixed_place=False):
         if not name:
             return False
 
-        self.parties.update_one(
-            {"name": name.strip()},
-            {
-                "$set": {
-                    "gstin": gstin.strip(),
-                    "place": place.strip(),
-                    "fixed_place": bool(fixed_place)
-                }
-            },
-            upsert=True
-        )
+        self.store.upsert("parties", *party_upsert(name, gstin, place, fixed_place))
+        self.index_name("parties", name.strip())
+        self.reference_changed()
         return True
 
     def get_party(self, name):
-        row = self.parties.find_one({"name": name})
+        return dict(self._cached(("party", name), lambda: self._load_party(name)))
+
+    @timed_phase(STORAGE_PHASE)
+    def _load_party(self, name):
+        row = self.store.find_one("parties", {"name": name})
         if not row:
             return {}
 
@@ -56,92 +259,392 @@ class DatabaseManager:
             "fixed_place": row.get("fixed_place", False)
         }
 
+    @timed_phase(STORAGE_PHASE)
     def get_all_parties(self):
-        return sorted([p["name"] for p in self.parties.find({}, {"name": 1})])
+        return sorted(self.store.names("parties"))
 
     # ------------------ Transports ------------------
+    @timed_phase(STORAGE_PHASE)
     def add_transport(self, name, gstin=""):
         if not name:
             return False
 
-        self.transports.update_one(
-            {"name": name.strip()},
-            {"$set": {"gstin": gstin.strip()}},
-            upsert=True
-        )
+        self.store.upsert("transports", *transport_upsert(name, gstin))
+        self.index_name("transports", name.strip())
+        self.reference_changed()
         return True
 
     def get_transport(self, name):
-        row = self.transports.find_one({"name": name})
+        return dict(self._cached(("transport", name), lambda: self._load_transport(name)))
+
+    @timed_phase(STORAGE_PHASE)
+    def _load_transport(self, name):
+        row = self.store.find_one("transports", {"name": name})
         if not row:
             return {}
         return {"name": row["name"], "gstin": row.get("gstin", "")}
 
+    @timed_phase(STORAGE_PHASE)
     def get_all_transports(self):
-        return sorted([t["name"] for t in self.transports.find({}, {"name": 1})])
+        return sorted(self.store.names("transports"))
 
     # ------------------ Cities ------------------
     def add_city(self, city, state):
+        """Queue a city for the next batched write (see CITY_FLUSH_SIZE)."""
         if not city or not state:
             return False
 
-        self.cities.update_one(
-            {"city": city.strip(), "state": state.strip()},
-            {"$setOnInsert": {"city": city.strip(), "state": state.strip()}},
-            upsert=True
-        )
+        city, state = city.strip(), state.strip()
+        self.city_buffer.add((city, state))
+        self.index_city(city, state)  # searchable before the batch is written
         return True
 
+    def flush_cities(self):
+        self.city_buffer.flush()
+
+    def _write_cities(self, cities):
+        _, _, errors = self.bulk_upsert("cities", [city_upsert(c, s) for c, s in cities])
+        if errors:
+            print(f"⚠️ {len(errors)} of {len(cities)} cities not saved: {next(iter(errors.values()))}")
+
+    @timed_phase(STORAGE_PHASE)
     def get_all_cities(self):
-        cities = list(self.cities.find({}, {"city": 1, "state": 1}))
-        result = []
-        for c in cities:
-            abbrev = "".join([w[0].upper() + "." for w in c["state"].split()])
-            result.append(f"{c['city']} ({abbrev})")
-        return sorted(result)
+        return sorted(city_label(c["city"], c["state"]) for c in self.store.rows("cities"))
+
+    # ------------------ Bank details ------------------
+    def get_bank_details(self):
+        return [dict(b) for b in self._cached(("bank_details",), self._load_bank_details)]
+
+    @timed_phase(STORAGE_PHASE)
+    def _load_bank_details(self):
+        return self.store.rows("bank_details")
+
+    # ------------------ Bulk upserts ------------------
+    @timed_phase(STORAGE_PHASE)
+    def bulk_upsert(self, table, upserts):
+        """
+        Apply a batch of (filter, update) upserts to a reference table in one
+        unordered write. Returns (inserted, matched, errors), where errors
+        maps the position in `upserts` to the backend's message.
+        """
+        if table not in ("parties", "transports", "cities"):
+            raise ValueError(f"Unknown table: {table}")
+        inserted, matched, errors = self.store.bulk_upsert(table, upserts)
+        if table in ("parties", "transports"):
+            for i, (f, _) in enumerate(upserts):
+                if i not in errors:
+                    self.index_name(table, f["name"])
+            if len(errors) < len(upserts):
+                self.reference_changed()
+        else:
+            for i, (f, _) in enumerate(upserts):
+                if i not in errors:
+                    self.index_city(f["city"], f["state"])
+        return inserted, matched, errors
+
+    # ------------------ Typeahead ------------------
+    @timed_phase(STORAGE_PHASE)
+    def _load_names(self, table):
+        if table == "cities":
+            # City labels, searchable by city and full state name
+            return {city_label(c["city"], c["state"]): f"{c['city']} {c['state']}"
+                    for c in self.store.rows("cities")}
+        return self.store.names(table)
+
+    def name_index(self, table):
+        """PrefixIndex over a table's names, rebuilt when older than NAME_INDEX_TTL."""
+        index = self._name_indexes.get(table)
+        if index is None or time.time() - index.built > NAME_INDEX_TTL:
+            names = self._load_names(table)
+            if index is None:
+                index = self._name_indexes[table] = PrefixIndex(names)
+            else:
+                index.rebuild(names)
+        return index
+
+    def index_name(self, table, name, text=None):
+        # Only keep an index current once it exists; the first search builds it
+        if table in self._name_indexes and name:
+            self._name_indexes[table].add(name, text)
+
+    def index_city(self, city, state):
+        if city and state:
+            self.index_name("cities", city_label(city, state), f"{city} {state}")
+
+    def forget_name(self, table, name):
+        if table in self._name_indexes and name:
+            self._name_indexes[table].remove(name)
+
+    def forget_city(self, city, state):
+        if city and state:
+            self.forget_name("cities", city_label(city, state))
+
+    def search_names(self, table, query, page=1, per_page=20):
+        """One page of matching names and whether there are more."""
+        return self.name_index(table).search(query, (max(page, 1) - 1) * per_page, per_page)
 
     # ------------------ Pending Requests ------------------
+    @timed_phase(STORAGE_PHASE)
     def add_pending(self, type_, name, gstin="", place=""):
         if not name:
             return False
 
         key = name.strip()
 
-        # Already exists in main table?
-        if type_ == "party" and self.parties.find_one({"name": key}):
-            return False
-        if type_ == "transport" and self.transports.find_one({"name": key}):
-            return False
-
-        # Already pending?
-        if self.pending.find_one({"type": type_, "name": key}):
+        # Already exists in main table? Answered from the reference cache,
+        # which every worker drops within REFERENCE_VERSION_POLL of a write
+        lookup = {"party": self.get_party, "transport": self.get_transport}.get(type_)
+        if lookup and lookup(key):
             return False
 
-        self.pending.insert_one({
-            "type": type_,
-            "name": key,
-            "gstin": gstin.strip(),
-            "place": place.strip() if type_ == "party" else ""
-        })
-        return True
+        # Insert unless already pending, in a single write
+        return self.store.add_pending(type_, key, gstin.strip(), place.strip() if type_ == "party" else "")
 
+    @timed_phase(STORAGE_PHASE)
     def get_all_pending(self):
-        return list(self.pending.find({}, {"_id": 0}).sort("_id", -1))
+        return self.store.list_pending()
 
     def approve_pending(self, type_, name):
-        key = name.strip()
-        row = self.pending.find_one({"type": type_, "name": key})
-        if not row:
-            return False
+        return self.resolve_pending_bulk("approve", [(type_, name)])[0]["status"] == "approved"
 
-        if type_ == "party":
-            self.add_party(key, row.get("gstin", ""), row.get("place", ""))
-        else:
-            self.add_transport(key, row.get("gstin", ""))
-
-        self.pending.delete_one({"type": type_, "name": key})
+    @timed_phase(STORAGE_PHASE)
+    def reject_pending(self, type_, name):
+        self.store.delete_pending(type_, name.strip())
         return True
 
-    def reject_pending(self, type_, name):
-        self.pending.delete_one({"type": type_, "name": name.strip()})
+    @timed_phase(STORAGE_PHASE)
+    def resolve_pending_bulk(self, action, items):
+        """
+        Approve or reject many pending requests at once. `items` is a list of
+        (type, name) pairs; returns one {"type", "name", "status"} per item.
+
+        One read loads every request, then the backend applies the approvals
+        and deletes the requests together (see Storage.resolve_pending).
+        """
+        results = []
+        keys = []
+        for type_, name in items:
+            key = (type_, (name or "").strip())
+            if type_ not in ("party", "transport") or not key[1]:
+                results.append({"type": type_, "name": name, "status": "invalid"})
+            else:
+                keys.append(key)
+                results.append({"type": type_, "name": key[1], "status": None})
+        if not keys:
+            return results
+
+        rows = self.store.find_pending(keys)
+
+        upserts = {"parties": [], "transports": []}
+        if action == "approve":
+            for (type_, name), row in rows.items():
+                if type_ == "party":
+                    upserts["parties"].append(party_upsert(name, row.get("gstin", ""), row.get("place", "")))
+                else:
+                    upserts["transports"].append(transport_upsert(name, row.get("gstin", "")))
+
+        self.store.resolve_pending(rows, upserts)
+
+        done = "approved" if action == "approve" else "rejected"
+        for result in results:
+            if result["status"] is None:
+                found = (result["type"], result["name"]) in rows
+                result["status"] = done if found else "not_found"
+
+        if action == "approve" and rows:
+            for type_, name in rows:
+                self.index_name("parties" if type_ == "party" else "transports", name)
+            self.reference_changed()
+        return results
+
+    # ------------------ Invoices ------------------
+    ROLLUP_FIELDS = ("taxable", "gst", "grand_total")
+    PAISE_FIELDS = ("taxable", "gst", "grand_total", "igst", "cgst", "sgst")
+
+    def _parse_invoice_date(self, value):
+        for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(value, fmt)
+            except (TypeError, ValueError):
+                pass
+        return None
+
+    @timed_phase("mongo")
+    def save_invoice(self, data, totals):
+        """
+        Upsert an invoice with its line items, keyed by invoice number within
+        its financial year (numbering restarts every April), and move the
+        monthly GST rollups by the difference to the stored copy.
+        Re-saving the same bill therefore never double counts.
+        """
+        invoice_date = self._parse_invoice_date(data.get("date"))
+        doc = {
+            "invoice_no": data["invoice_no"],
+            "invoice_date": invoice_date,
+            "fy": financial_year(invoice_date),
+            "month": invoice_date.strftime("%Y-%m") if invoice_date else None,
+            "date": data.get("date", ""),
+            "party_name": data.get("party_name", "").strip(),
+            "party_gstin": data.get("party_gstin", ""),
+            "place": data.get("place", ""),
+            "transport": data.get("transport", ""),
+            "transport_gstin": data.get("transport_gstin", ""),
+            "items": [
+                {
+                    "name": i["name"],
+                    "qty": i["qty"],
+                    "unit": i["unit"],
+                    "rate": i["rate"],
+                    "amount": invoice_math.rupees(invoice_math.line_paise(i["qty"], i["rate"])),
+                }
+                for i in data["items"]
+            ],
+            "total": totals["total"],
+            "taxable": totals["rounded_total"],
+            "gst": totals["gst"],
+            "grand_total": totals["grand_total"],
+            # Exact amounts; the rupee fields above are kept for existing readers
+            "gst_mode": totals["gst_mode"],
+            "gst_rate_bp": totals["gst_rate_bp"],
+            **{f"{f}_paise": totals[f"{f}_paise"] for f in self.PAISE_FIELDS if f"{f}_paise" in totals},
+            "updated_at": datetime.utcnow(),
+        }
+
+        previous = self.invoices.find_one_and_replace(
+            {"invoice_no": doc["invoice_no"], "fy": doc["fy"]},
+            doc,
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+
+        deltas = {}
+        self._add_rollup_delta(deltas, previous, -1)
+        self._add_rollup_delta(deltas, doc, +1)
+        ops = [
+            UpdateOne(dict(key), {"$inc": inc}, upsert=True)
+            for key, inc in deltas.items()
+            if any(inc.values())
+        ]
+        if ops:
+            self.rollups.bulk_write(ops, ordered=False)
         return True
+
+    def _add_rollup_delta(self, deltas, doc, sign):
+        """Accumulate one invoice's contribution into its month and party rollups."""
+        if not doc or not doc.get("month"):
+            return
+        keys = [
+            (("scope", "month"), ("month", doc["month"]), ("party", "")),
+            (("scope", "party"), ("month", doc["month"]), ("party", doc["party_name"])),
+        ]
+        for key in keys:
+            inc = deltas.setdefault(key, {"invoices": 0, **{f: 0 for f in self.ROLLUP_FIELDS}})
+            inc["invoices"] += sign
+            for f in self.ROLLUP_FIELDS:
+                inc[f] += sign * doc.get(f, 0)
+
+    @timed_phase("mongo")
+    def get_invoice(self, invoice_no, fy=None):
+        """The invoice with this number in financial year fy (default: the latest one)."""
+        query = {"invoice_no": invoice_no}
+        if fy:
+            query["fy"] = fy
+        return self.invoices.find_one(query, {"_id": 0}, sort=[("invoice_date", DESCENDING)])
+
+    @timed_phase("mongo")
+    def get_gst_summary(self, start_month, end_month, party=None):
+        """
+        Monthly rollups between two "YYYY-MM" months (inclusive), for all
+        parties or for one party. Served from a single indexed range read.
+        """
+        query = {
+            "scope": "party" if party else "month",
+            "month": {"$gte": start_month, "$lte": end_month},
+            "invoices": {"$gt": 0},
+        }
+        if party:
+            query["party"] = party.strip()
+        return list(self.rollups.find(query, {"_id": 0, "scope": 0}).sort("month", ASCENDING))
+
+    AUDIT_FIELDS = {
+        "_id": 0, "invoice_no": 1, "items.qty": 1, "items.rate": 1, "gst_mode": 1, "gst_rate_bp": 1,
+        "taxable": 1, "gst": 1, "grand_total": 1,
+        "taxable_paise": 1, "gst_paise": 1, "grand_total_paise": 1,
+    }
+
+    @timed_phase("mongo")
+    def audit_invoices(self, start=None, end=None, batch_size=5000):
+        """
+        Recompute the totals of every stored invoice (optionally in a date
+        range) and return (checked, mismatches); see invoice_math.audit_totals.
+        """
+        query = self._date_range(start, end) if start and end else {}
+        cursor = self.invoices.find(query, self.AUDIT_FIELDS).batch_size(batch_size)
+        return invoice_math.audit_totals(cursor)
+
+    # ------------------ Sales exports ------------------
+    EXPORT_FIELDS = {
+        "_id": 0, "invoice_no": 1, "invoice_date": 1, "party_name": 1, "party_gstin": 1,
+        "place": 1, "taxable": 1, "gst": 1, "grand_total": 1,
+        "gst_mode": 1, "gst_rate_bp": 1, "cgst_paise": 1, "sgst_paise": 1,
+    }
+
+    def _date_range(self, start, end):
+        """Inclusive date range on invoice_date; start/end are datetimes."""
+        return {"invoice_date": {"$gte": start, "$lt": end + timedelta(days=1)}}
+
+    def iter_invoices(self, start, end, registered=None, by_party=False, batch_size=1000):
+        """
+        Cursor over invoices in a date range, fetched in batches.
+        registered=True/False restricts to B2B (GSTIN) or B2C ("URP-") bills.
+        by_party orders by GSTIN first so B2B rows can be grouped while streaming.
+        """
+        query = self._date_range(start, end)
+        if registered is True:
+            query["party_gstin"] = {"$not": re.compile("^URP-")}
+        elif registered is False:
+            query["party_gstin"] = re.compile("^URP-")
+
+        sort = [("invoice_date", ASCENDING), ("invoice_no", ASCENDING)]
+        if by_party:
+            sort = [("party_gstin", ASCENDING)] + sort
+        return self.invoices.find(query, self.EXPORT_FIELDS).sort(sort).batch_size(batch_size)
+
+    @timed_phase("mongo")
+    def sum_invoices(self, start, end, registered=None, by_rate=False):
+        """
+        Server-side totals of taxable value, GST and invoice value. by_rate
+        returns one row per (gst_mode, gst_rate_bp) instead, with the
+        CGST/SGST paise summed too.
+        """
+        match = self._date_range(start, end)
+        if registered is False:
+            match["party_gstin"] = re.compile("^URP-")
+        group = {
+            "_id": None,
+            "invoices": {"$sum": 1},
+            "taxable": {"$sum": "$taxable"},
+            "gst": {"$sum": "$gst"},
+            "grand_total": {"$sum": "$grand_total"},
+        }
+        if by_rate:
+            group["_id"] = {
+                "gst_mode": {"$ifNull": ["$gst_mode", invoice_math.LEGACY_GST_MODE]},
+                "gst_rate_bp": {"$ifNull": ["$gst_rate_bp", invoice_math.LEGACY_GST_RATE_BP]},
+            }
+            group["cgst_paise"] = {"$sum": "$cgst_paise"}
+            group["sgst_paise"] = {"$sum": "$sgst_paise"}
+        rows = list(self.invoices.aggregate([{"$match": match}, {"$group": group}]))
+        if by_rate:
+            return sorted(({**row.pop("_id"), **row} for row in rows),
+                          key=lambda r: (r["gst_rate_bp"], r["gst_mode"]))
+        return rows[0] if rows else {"invoices": 0, "taxable": 0, "gst": 0, "grand_total": 0}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["--create-indexes"]:
+        sys.exit("usage: python data_manager.py --create-indexes")
+    DatabaseManager(create_indexes=True).ensure_indexes()
+    print("✅ Indexes created")
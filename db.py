@@ -1,5 +1,5 @@
-from pymongo import MongoClient
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,8 +11,73 @@ MONGO_DB = os.getenv("MONGO_DB")
 
 MONGO_URI = f"mongodb+srv://{MONGO_USER}:{MONGO_PASS}@{MONGO_HOST}/?appName=bill-cluster0"
 MONGO_DB= MONGO_DB if MONGO_DB else "bill_app"
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB]   # Use this everywhere
+
+# Connection pool and timeouts; unset keeps pymongo's default
+CLIENT_OPTIONS = {
+    option: int(os.environ[env])
+    for option, env in (
+        ("maxPoolSize", "MONGO_MAX_POOL_SIZE"),
+        ("minPoolSize", "MONGO_MIN_POOL_SIZE"),
+        ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS"),
+        ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS"),
+        ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS"),
+        ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+        ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    )
+    if os.environ.get(env)
+}
+
+# The client is built on first use, not at import: a mongodb+srv URI costs a
+# DNS lookup and the client starts monitor threads, and neither is needed
+# until a request actually reads or writes. (The pymongo package itself is
+# imported at startup anyway, by data_manager and storage.)
+# The client is also keyed by process id:
+# MongoClient is not fork-safe, so a forked worker builds its own instead of
+# using the one it inherited.
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                from pymongo import MongoClient
+                _client = MongoClient(MONGO_URI, **CLIENT_OPTIONS)
+                _client_pid = os.getpid()
+    return _client
+
+
+def reset_client():
+    """Forget the client without closing it (after fork, it belongs to the parent)."""
+    global _client, _client_pid
+    with _lock:
+        _client, _client_pid = None, None
+
+
+def close_client():
+    """Close this process's client, e.g. when a worker shuts down."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client, _client_pid = None, None
+
+
+def get_db():
+    return get_client()[MONGO_DB]
+
 
 def get_collection(name: str):
-    return db[name]
+    return get_db()[name]
+
+
+def __getattr__(name):
+    # `from db import client, db` keeps working, resolved lazily
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
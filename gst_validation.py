@@ -0,0 +1,105 @@
+"""
+GSTIN / PAN / Aadhaar validation.
+
+A GSTIN is 15 characters: a 2-digit state code, the holder's PAN, an
+entity number, a literal "Z" and a mod-36 check character. validate()
+checks the shape, the state code and the check character, and memoizes
+results because the same few hundred numbers come up over and over.
+validate_many() is the batch form used by imports, reports and /validate.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+GSTIN_PATTERN = re.compile(r"^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]$")
+PAN_PATTERN = re.compile(r"^[A-Z]{5}[0-9]{4}[A-Z]$")
+AADHAAR_PATTERN = re.compile(r"^[0-9]{12}$")
+
+CHECKSUM_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_CHAR_VALUE = {c: i for i, c in enumerate(CHECKSUM_CHARS)}
+
+STATE_CODES = {
+    "01": "Jammu and Kashmir", "02": "Himachal Pradesh", "03": "Punjab",
+    "04": "Chandigarh", "05": "Uttarakhand", "06": "Haryana", "07": "Delhi",
+    "08": "Rajasthan", "09": "Uttar Pradesh", "10": "Bihar", "11": "Sikkim",
+    "12": "Arunachal Pradesh", "13": "Nagaland", "14": "Manipur", "15": "Mizoram",
+    "16": "Tripura", "17": "Meghalaya", "18": "Assam", "19": "West Bengal",
+    "20": "Jharkhand", "21": "Odisha", "22": "Chhattisgarh", "23": "Madhya Pradesh",
+    "24": "Gujarat", "25": "Daman and Diu", "26": "Dadra and Nagar Haveli and Daman and Diu",
+    "27": "Maharashtra", "28": "Andhra Pradesh (Old)", "29": "Karnataka", "30": "Goa",
+    "31": "Lakshadweep", "32": "Kerala", "33": "Tamil Nadu", "34": "Puducherry",
+    "35": "Andaman and Nicobar Islands", "36": "Telangana", "37": "Andhra Pradesh",
+    "38": "Ladakh", "97": "Other Territory", "99": "Centre Jurisdiction",
+}
+
+BATCH_LIMIT = 10000
+
+
+class Validation(NamedTuple):
+    value: str                 # normalized input (upper case, no spaces)
+    type: str                  # "GST", "PAN", "AADHAAR" or "INVALID"
+    valid: bool
+    state_code: Optional[str] = None
+    state: Optional[str] = None
+    pan: Optional[str] = None
+    error: Optional[str] = None
+
+
+def normalize(number):
+    return re.sub(r"\s+", "", str(number or "")).upper()
+
+
+def gstin_check_char(first14):
+    """Mod-36 check character for the first 14 characters of a GSTIN."""
+    total = 0
+    for i, char in enumerate(first14):
+        product = _CHAR_VALUE[char] * (2 if i % 2 else 1)
+        total += product // 36 + product % 36
+    return CHECKSUM_CHARS[(36 - total % 36) % 36]
+
+
+@lru_cache(maxsize=4096)
+def _validate(value):
+    if GSTIN_PATTERN.match(value):
+        state_code = value[:2]
+        state = STATE_CODES.get(state_code)
+        if state is None:
+            return Validation(value, "INVALID", False, state_code, error=f"unknown state code {state_code}")
+        expected = gstin_check_char(value[:14])
+        if value[14] != expected:
+            return Validation(value, "INVALID", False, state_code, state, value[2:12],
+                              error=f"check character should be {expected}")
+        return Validation(value, "GST", True, state_code, state, value[2:12])
+    if PAN_PATTERN.match(value):
+        return Validation(value, "PAN", True, pan=value)
+    if AADHAAR_PATTERN.match(value):
+        return Validation(value, "AADHAAR", True)
+    return Validation(value, "INVALID", False, error="not a GSTIN, PAN or Aadhaar number")
+
+
+def validate(number):
+    return _validate(normalize(number))
+
+
+def validate_many(numbers):
+    """Validate a batch; each distinct number is checked once."""
+    seen = {}
+    results = []
+    for number in numbers:
+        value = normalize(number)
+        result = seen.get(value)
+        if result is None:
+            result = seen[value] = _validate(value)
+        results.append(result)
+    return results
+
+
+def identify_number_type(number):
+    """'GST', 'PAN', 'AADHAAR' or 'INVALID'; a GSTIN must pass its checksum."""
+    return validate(number).type
+
+
+def format_gstin(gstin):
+    """Valid GSTINs unchanged; anything else marked unregistered ("URP-")."""
+    value = normalize(gstin)
+    return value if _validate(value).type == "GST" else f"URP-{value}"
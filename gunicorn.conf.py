@@ -0,0 +1,80 @@
+"""
+Production server settings: gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload) and forked into
+WEB_CONCURRENCY workers of GUNICORN_THREADS threads each. Every worker
+builds its own Mongo client after the fork (app.after_fork) and flushes
+buffered writes and closes it on the way out (app.shutdown). Pool size and
+timeouts of that client come from the MONGO_* variables read in db.py.
+
+Environment:
+    PORT                    listen port (default 5091)
+    WEB_CONCURRENCY         worker processes (default 2)
+    GUNICORN_THREADS        threads per worker (default 4)
+    GUNICORN_TIMEOUT        seconds before a silent worker is killed (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT  seconds to finish in-flight requests on shutdown (default 30)
+    GUNICORN_KEEPALIVE      keep-alive seconds (default 5)
+    GUNICORN_MAX_REQUESTS   recycle a worker after this many requests (default 0, never)
+    PRELOAD_APP             import the app in the master before forking (default 1)
+    WARMUP_ON_START         warm each worker up right after it starts (default off)
+    RENDER_JOB_STORE        where async render jobs live (default "mongo" with more
+                            than one worker, so /jobs/<id> works from any of them)
+"""
+import os
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5091)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+preload_app = _env_bool("PRELOAD_APP", "1")
+
+# Async /download jobs are polled on whichever worker gets the request
+os.environ.setdefault("RENDER_JOB_STORE", "mongo" if workers > 1 else "memory")
+
+accesslog = "-"
+errorlog = "-"
+
+# Warmup runs per worker below, never in the master: a thread still running
+# there at fork time could leave a lock held in every child.
+WARMUP = _env_bool("WARMUP_ON_START", "")
+os.environ["WARMUP_ON_START"] = ""
+
+
+def on_starting(server):
+    if preload_app:
+        # Share the ReportLab import between workers instead of paying it per worker
+        import bill_template  # noqa: F401
+
+
+def post_fork(server, worker):
+    import app
+
+    app.after_fork()
+
+
+def post_worker_init(worker):
+    if WARMUP:
+        import threading
+
+        import app
+
+        threading.Thread(target=app.warmup, name="warmup", daemon=True).start()
+
+
+def worker_exit(server, worker):
+    import app
+
+    try:
+        app.shutdown()
+    except Exception as e:
+        server.log.warning("Worker %s shutdown incomplete: %s", worker.pid, e)
@@ -0,0 +1,169 @@
+"""
+Content-addressed archive of rendered invoices.
+
+Every PDF is stored under the SHA-256 of its normalized input (invoice
+fields, line items and bank details), so an identical request can be served
+without re-rendering and the hash doubles as the HTTP ETag. A secondary
+index maps invoice numbers to the latest archived PDF.
+
+INVOICE_ARCHIVE selects the backend: "disk" (default, under
+INVOICE_ARCHIVE_DIR), "gridfs", or "off".
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from functools import cached_property
+
+import invoice_math
+from pdf_profiles import DEFAULT_PROFILE
+
+# Bump when the PDF layout or amounts change so old archive entries stop matching
+# (2: paise arithmetic with half-up rounding and CGST + SGST rows;
+#  3: pages filled up to PAGE_ROWS)
+ARCHIVE_VERSION = 3
+
+INVOICE_ARCHIVE = os.environ.get("INVOICE_ARCHIVE", "disk").lower()
+INVOICE_ARCHIVE_DIR = os.environ.get("INVOICE_ARCHIVE_DIR", "data/invoices")
+
+KEY_FIELDS = ["invoice_no", "date", "party_name", "place", "party_gstin", "transport", "transport_gstin"]
+
+
+def invoice_key(data, banks, profile=None):
+    """Hash of everything that ends up on the PDF, and how it was written."""
+    normalized = {
+        "v": ARCHIVE_VERSION,
+        "fields": {f: str(data.get(f, "")).strip() for f in KEY_FIELDS},
+        # Quantities and rates as the invoice math sees them (thousandths and
+        # paise), so bills that differ only past the printed decimals differ here too
+        "items": [
+            [str(i["name"]).strip(), invoice_math.scaled(i["qty"], invoice_math.QTY_SCALE),
+             str(i["unit"]).strip(), invoice_math.scaled(i["rate"], 100)]
+            for i in data["items"]
+        ],
+        "banks": [[b.get("bank_name", ""), b.get("account_number", ""), b.get("ifsc", "")] for b in banks or []],
+        # The tax rows printed under the total
+        "gst": [invoice_math.GST_MODE, invoice_math.rate_bp()],
+    }
+    # Only other profiles are keyed, so entries archived before profiles existed still match
+    if profile and profile != DEFAULT_PROFILE:
+        normalized["profile"] = profile
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def invoice_meta(data, total):
+    return {
+        "invoice_no": data["invoice_no"],
+        "date": data["date"],
+        "party_name": data.get("party_name", ""),
+        "party_gstin": data.get("party_gstin", ""),
+        "place": data.get("place", ""),
+        "total": total,
+        "created": time.time(),
+    }
+
+
+class LocalArchive:
+    """PDFs under <root>/<key[:2]>/<key>.pdf with a JSON sidecar for metadata."""
+
+    def __init__(self, root=INVOICE_ARCHIVE_DIR):
+        self.root = root
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def _number_path(self, invoice_no):
+        digest = hashlib.sha1(str(invoice_no).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, "by_number", f"{digest}.json")
+
+    def _write(self, path, payload):
+        # Write to a temp file and rename, so readers never see partial files
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(payload, "read"):
+                shutil.copyfileobj(payload, f)
+            else:
+                f.write(payload)
+        os.replace(tmp, path)
+
+    def exists(self, key):
+        return os.path.exists(self._path(key, "pdf"))
+
+    def get(self, key):
+        """Return (pdf_bytes, meta) or None."""
+        try:
+            with open(self._path(key, "pdf"), "rb") as f:
+                pdf = f.read()
+            with open(self._path(key, "json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        return pdf, meta
+
+    def put(self, key, pdf, meta):
+        """Store pdf (bytes or a file object read from its current position)."""
+        self._write(self._path(key, "json"), json.dumps(meta).encode("utf-8"))
+        self._write(self._path(key, "pdf"), pdf)
+        self._write(self._number_path(meta["invoice_no"]),
+                    json.dumps({"invoice_no": meta["invoice_no"], "key": key}).encode("utf-8"))
+
+    def find_by_invoice_no(self, invoice_no):
+        try:
+            with open(self._number_path(invoice_no), "r", encoding="utf-8") as f:
+                return json.load(f)["key"]
+        except FileNotFoundError:
+            return None
+
+
+class GridFSArchive:
+    """PDFs in a GridFS bucket; the key is the filename, metadata rides along."""
+
+    def __init__(self, get_database, bucket_name="invoice_pdfs"):
+        # Resolved on first use, so choosing this backend opens no connection
+        self._get_database = get_database
+        self.bucket_name = bucket_name
+
+    @cached_property
+    def bucket(self):
+        import gridfs
+
+        return gridfs.GridFSBucket(self._get_database(), bucket_name=self.bucket_name)
+
+    @cached_property
+    def files(self):
+        files = self._get_database()[f"{self.bucket_name}.files"]
+        files.create_index("filename")
+        files.create_index([("metadata.invoice_no", 1), ("uploadDate", -1)])
+        return files
+
+    def exists(self, key):
+        return self.files.find_one({"filename": key}, {"_id": 1}) is not None
+
+    def get(self, key):
+        doc = self.files.find_one({"filename": key})
+        if not doc:
+            return None
+        return self.bucket.open_download_stream(doc["_id"]).read(), doc.get("metadata", {})
+
+    def put(self, key, pdf, meta):
+        if not self.exists(key):
+            self.bucket.upload_from_stream(key, pdf, metadata=meta)
+
+    def find_by_invoice_no(self, invoice_no):
+        doc = self.files.find_one({"metadata.invoice_no": invoice_no}, {"filename": 1},
+                                  sort=[("uploadDate", -1)])
+        return doc["filename"] if doc else None
+
+
+def get_archive():
+    """Archive selected by INVOICE_ARCHIVE, or None when archiving is off."""
+    if INVOICE_ARCHIVE == "off":
+        return None
+    if INVOICE_ARCHIVE == "gridfs":
+        from db import get_db
+        return GridFSArchive(get_db)
+    return LocalArchive()
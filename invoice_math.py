@@ -0,0 +1,217 @@
+"""
+Invoice arithmetic in integer paise.
+
+Quantities are taken to 3 decimals and rates to whole paise, so every line
+amount is qty_milli * rate_paise / 1000 rounded half-up: exact, and the
+same in every process. The subtotal is rounded half-up to whole rupees
+(the taxable value printed as "Total"), and GST is charged on that either
+as IGST or split equally into CGST + SGST.
+
+GST_MODE picks the split: "AUTO" (default) charges CGST + SGST when the
+place of supply is the seller's own state and IGST otherwise, as GST law
+requires; "IGST" or "CGST_SGST" force one mode for every bill. GST_RATE
+(percent) sets the rate.
+audit_totals() recomputes stored invoices in bulk, vectorized with NumPy
+when it is installed.
+"""
+import os
+from decimal import Decimal, ROUND_HALF_UP
+
+GST_MODE = os.environ.get("GST_MODE", "AUTO").upper()
+GST_RATE = os.environ.get("GST_RATE", "5")
+
+SELLER_GSTIN = "24AHJPR6707K1ZY"
+SELLER_STATE = SELLER_GSTIN[:2]
+
+QTY_SCALE = 1000  # quantities are held in thousandths
+
+# Invoices saved before the GST mode and rate were stored were billed as IGST at 5%
+LEGACY_GST_MODE = "IGST"
+LEGACY_GST_RATE_BP = 500
+
+
+def scaled(value, scale):
+    """int(value * scale) rounded half-up, computed in Decimal."""
+    return int((Decimal(str(value)) * scale).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def rate_bp(rate=None):
+    """GST rate in basis points (5% -> 500)."""
+    return scaled(GST_RATE if rate is None else rate, 100)
+
+
+def is_registered(gstin):
+    return bool(gstin) and not gstin.startswith("URP-")
+
+
+def place_of_supply(gstin):
+    """State code of the buyer's GSTIN; unregistered buyers are billed in-state."""
+    if is_registered(gstin) and gstin[:2].isdigit():
+        return gstin[:2]
+    return SELLER_STATE
+
+
+def gst_mode_for(party_gstin, mode=None):
+    """The GST mode ("IGST" or "CGST_SGST") a bill to this buyer is charged in."""
+    mode = (mode or GST_MODE).upper()
+    if mode != "AUTO":
+        return mode
+    return "CGST_SGST" if place_of_supply(party_gstin) == SELLER_STATE else "IGST"
+
+
+def stored_gst(inv):
+    """(mode, rate in basis points) an invoice document was billed with."""
+    return (inv.get("gst_mode") or LEGACY_GST_MODE).upper(), inv.get("gst_rate_bp", LEGACY_GST_RATE_BP)
+
+
+def format_paise(paise):
+    sign = "-" if paise < 0 else ""
+    paise = abs(paise)
+    return f"{sign}{paise // 100}.{paise % 100:02d}"
+
+
+def format_qty(qty):
+    """Quantity as the kernel reads it: 2 decimals, or 3 when it has thousandths."""
+    milli = scaled(qty, QTY_SCALE)
+    text = f"{milli // QTY_SCALE}.{milli % QTY_SCALE:03d}"
+    return text[:-1] if milli % 10 == 0 else text
+
+
+def rupees(paise):
+    return paise / 100
+
+
+def whole_rupees(paise):
+    """Rupees rounded half-up, as spelled out in words on the bill."""
+    return _div_half_up(paise, 100)
+
+
+# ---------- Kernel ----------
+def _div_half_up(numerator, denominator):
+    # Non-negative amounts only, like everything printed on a bill
+    return (numerator + denominator // 2) // denominator
+
+
+def line_paise(qty, rate):
+    return _div_half_up(scaled(qty, QTY_SCALE) * scaled(rate, 100), QTY_SCALE)
+
+
+def tax_lines(taxable_paise, mode=None, rate=None):
+    """[(label, key, paise), ...] for the GST rows printed under the total."""
+    mode = gst_mode_for("", mode)
+    bp = rate_bp(rate)
+    if mode == "CGST_SGST":
+        half = _div_half_up(taxable_paise * bp, 20000)
+        label = f"{Decimal(bp) / 200:g}%"
+        return [(f"Add CGST @{label}", "cgst", half), (f"Add SGST @{label}", "sgst", half)]
+    return [(f"Add IGST @{Decimal(bp) / 100:g}%", "igst", _div_half_up(taxable_paise * bp, 10000))]
+
+
+def totals_from_paise(subtotal_paise, mode=None, rate=None):
+    taxable = _div_half_up(subtotal_paise, 100) * 100
+    taxes = tax_lines(taxable, mode, rate)
+    gst = sum(paise for _, _, paise in taxes)
+    totals = {
+        "gst_mode": gst_mode_for("", mode),
+        "gst_rate_bp": rate_bp(rate),
+        "subtotal_paise": subtotal_paise,
+        "taxable_paise": taxable,
+        "gst_paise": gst,
+        "grand_total_paise": taxable + gst,
+        "taxes": [(label, paise) for label, _, paise in taxes],
+        # Rupee values, as the rest of the app has always used them
+        "total": rupees(subtotal_paise),
+        "rounded_total": rupees(taxable),
+        "gst": rupees(gst),
+        "grand_total": rupees(taxable + gst),
+    }
+    for _, key, paise in taxes:
+        totals[f"{key}_paise"] = paise
+    return totals
+
+
+def compute_totals(items, mode=None, rate=None):
+    """Totals exactly as printed on the bill, without rendering it."""
+    return totals_from_paise(sum(line_paise(i["qty"], i["rate"]) for i in items), mode, rate)
+
+
+# ---------- Batch audit ----------
+def _recompute_python(invoices):
+    out = []
+    for inv in invoices:
+        mode, bp = stored_gst(inv)
+        totals = compute_totals(inv.get("items", []), mode, Decimal(bp) / 100)
+        out.append((totals["taxable_paise"], totals["gst_paise"], totals["grand_total_paise"]))
+    return out
+
+
+def _scaled_array(values, scale, np):
+    """
+    scaled() over an array. Values that are already whole at this scale are
+    exact after rint(); only the ones within a hair of a half (where float
+    error could pick the wrong side) go through Decimal.
+    """
+    raw = np.asarray(values, dtype=np.float64) * scale
+    out = np.rint(raw).astype(np.int64)
+    for i in np.flatnonzero(np.abs(np.abs(raw - np.trunc(raw)) - 0.5) < 1e-6):
+        out[i] = scaled(values[i], scale)
+    return out
+
+
+def _recompute_numpy(invoices, np):
+    counts, qty, rate, bps, split = [], [], [], [], []
+    for inv in invoices:
+        items = inv.get("items", [])
+        counts.append(len(items))
+        for item in items:
+            qty.append(item["qty"])
+            rate.append(item["rate"])
+        mode, bp = stored_gst(inv)
+        bps.append(bp)
+        split.append(mode == "CGST_SGST")
+
+    counts = np.asarray(counts, dtype=np.int64)
+    lines = (_scaled_array(qty, QTY_SCALE, np) * _scaled_array(rate, 100, np) + QTY_SCALE // 2) // QTY_SCALE
+
+    # Per-invoice sums; empty invoices get 0
+    ends = np.cumsum(counts)
+    sums = np.concatenate(([0], np.cumsum(lines)))
+    subtotal = sums[ends] - sums[ends - counts]
+
+    taxable = (subtotal + 50) // 100 * 100
+    bps = np.asarray(bps, dtype=np.int64)
+    igst = (taxable * bps + 5000) // 10000
+    half = (taxable * bps + 10000) // 20000
+    gst = np.where(np.asarray(split, dtype=bool), 2 * half, igst)
+    return list(zip(taxable.tolist(), gst.tolist(), (taxable + gst).tolist()))
+
+
+def audit_totals(invoices, use_numpy=True):
+    """
+    Recompute stored invoices (dicts with items and *_paise fields) and
+    return (checked, mismatches). Each mismatch lists stored vs recomputed
+    paise. Invoices saved before paise fields existed are compared on their
+    rupee values.
+    """
+    invoices = list(invoices)
+    np = None
+    if use_numpy:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    recomputed = _recompute_numpy(invoices, np) if np is not None and invoices else _recompute_python(invoices)
+
+    mismatches = []
+    for inv, (taxable, gst, grand_total) in zip(invoices, recomputed):
+        stored = tuple(
+            inv[f"{f}_paise"] if f"{f}_paise" in inv else scaled(inv.get(f, 0), 100)
+            for f in ("taxable", "gst", "grand_total")
+        )
+        if stored != (taxable, gst, grand_total):
+            mismatches.append({
+                "invoice_no": inv.get("invoice_no"),
+                "stored": dict(zip(("taxable", "gst", "grand_total"), stored)),
+                "recomputed": {"taxable": taxable, "gst": gst, "grand_total": grand_total},
+            })
+    return len(invoices), mismatches
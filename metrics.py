@@ -0,0 +1,218 @@
+"""
+Request timing spans, latency histograms and counters, exposed in the
+Prometheus text format.
+
+Code marks the phases it wants to see with `span("mongo")` (or the
+`timed_phase` decorator). Inside a request every span is also kept in a
+per-request list, so a slow request can log exactly where its time went.
+Metrics are held per process; with several workers each one reports its own.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import request
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this (in milliseconds) get their span breakdown logged
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 1000))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_request_counts = {}   # (method, route, status) -> count
+_route_hist = {}       # route -> Histogram
+_phase_hist = {}       # phase -> Histogram
+_slow_requests = 0
+_collectors = []       # callables returning extra exposition lines
+
+# Spans of the current request as (path, seconds) in start order, or None.
+# A nested span's path is prefixed by its parents, e.g. "render/amount_words".
+_spans = ContextVar("request_spans", default=None)
+_parent = ContextVar("span_parent", default="")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+
+
+def _observe(table, key, seconds):
+    with _lock:
+        hist = table.get(key)
+        if hist is None:
+            hist = table[key] = Histogram()
+        hist.observe(seconds)
+
+
+# ---------- Spans ----------
+@contextmanager
+def span(phase):
+    """Time a block of work under the given phase name."""
+    spans = _spans.get()
+    parent = _parent.get()
+    path = f"{parent}/{phase}" if parent else phase
+    token = _parent.set(path)
+    if spans is not None:
+        index = len(spans)
+        spans.append((path, 0.0))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _parent.reset(token)
+        if spans is not None:
+            spans[index] = (path, elapsed)
+        _observe(_phase_hist, phase, elapsed)
+
+
+def timed_phase(phase):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(phase):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- Flask middleware ----------
+def init_app(app):
+    """
+    Time every request of a Flask app. The WSGI wrapper closes the timing
+    only once the server has finished sending the body, which is reported
+    as the 'response' phase.
+    """
+
+    @app.before_request
+    def _start_spans():
+        _spans.set(request.environ.setdefault("metrics.spans", []))
+
+    @app.after_request
+    def _handler_done(response):
+        request.environ["metrics.route"] = request.url_rule.rule if request.url_rule else "<unmatched>"
+        request.environ["metrics.status"] = str(response.status_code)
+        request.environ["metrics.handler_done"] = time.perf_counter()
+        return response
+
+    @app.teardown_request
+    def _stop_spans(exc):
+        _spans.set(None)
+
+    wsgi_app = app.wsgi_app
+
+    def metrics_wsgi_app(environ, start_response):
+        environ["metrics.start"] = time.perf_counter()
+        environ["metrics.spans"] = []
+        return ClosingIterator(wsgi_app(environ, start_response), lambda: _finish_request(environ))
+
+    app.wsgi_app = metrics_wsgi_app
+
+
+def _finish_request(environ):
+    sent = time.perf_counter()
+    start = environ["metrics.start"]
+    spans = environ["metrics.spans"]
+
+    handler_done = environ.get("metrics.handler_done", sent)
+    spans.append(("response", sent - handler_done))
+    _observe(_phase_hist, "response", sent - handler_done)
+
+    _record_request(
+        environ.get("REQUEST_METHOD", ""),
+        environ.get("metrics.route", "<unmatched>"),
+        environ.get("PATH_INFO", ""),
+        environ.get("metrics.status", "500"),
+        sent - start,
+        spans,
+    )
+
+
+def _record_request(method, route, path, status, seconds, spans):
+    global _slow_requests
+    with _lock:
+        key = (method, route, status)
+        _request_counts[key] = _request_counts.get(key, 0) + 1
+    _observe(_route_hist, route, seconds)
+
+    if seconds * 1000 >= SLOW_REQUEST_MS:
+        with _lock:
+            _slow_requests += 1
+        breakdown = " ".join(f"{path}={elapsed * 1000:.1f}ms" for path, elapsed in spans)
+        logger.warning("Slow request %s %s %s %.1fms: %s",
+                       method, path, status, seconds * 1000, breakdown or "no spans")
+
+
+# ---------- Prometheus exposition ----------
+def register_collector(fn):
+    """Add fn() -> list of exposition lines to every /metrics scrape."""
+    _collectors.append(fn)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name, label, table):
+    lines = []
+    for key, hist in sorted(table.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label}="{_label(key)}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label}="{_label(key)}",le="+Inf"}} {hist.count}')
+        lines.append(f'{name}_sum{{{label}="{_label(key)}"}} {hist.total:.6f}')
+        lines.append(f'{name}_count{{{label}="{_label(key)}"}} {hist.count}')
+    return lines
+
+
+def render_prometheus():
+    with _lock:
+        lines = [
+            "# HELP bill_http_requests_total HTTP requests by method, route and status.",
+            "# TYPE bill_http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(_request_counts.items()):
+            lines.append(
+                f'bill_http_requests_total{{method="{method}",route="{_label(route)}",'
+                f'status="{status}"}} {count}'
+            )
+
+        lines += [
+            "# HELP bill_http_request_duration_seconds Request latency including sending the body.",
+            "# TYPE bill_http_request_duration_seconds histogram",
+        ]
+        lines += _histogram_lines("bill_http_request_duration_seconds", "route", _route_hist)
+
+        lines += [
+            "# HELP bill_phase_duration_seconds Time spent per phase (mongo, sqlite, render, amount_words, response).",
+            "# TYPE bill_phase_duration_seconds histogram",
+        ]
+        lines += _histogram_lines("bill_phase_duration_seconds", "phase", _phase_hist)
+
+        lines += [
+            f"# HELP bill_slow_requests_total Requests slower than {SLOW_REQUEST_MS:g}ms.",
+            "# TYPE bill_slow_requests_total counter",
+            f"bill_slow_requests_total {_slow_requests}",
+        ]
+    for collect in _collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
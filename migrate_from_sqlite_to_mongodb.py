@@ -1,77 +1,101 @@
+import argparse
+import os
 import sqlite3
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, UpdateOne
+
+from migration import MigrationTask, add_arguments, run_migration, sqlite_chunks, sqlite_count
 
 SQLITE_PATH = "data/data.db"
-MONGO_URL = ""
+MONGO_URL = os.environ.get("MONGO_URL", "")
 DB_NAME = "bill_app"
+CHECKPOINT_PATH = "data/migrate_to_mongodb.checkpoint.json"
+
+
+# Each table: SQLite columns read, Mongo collection, and the upsert per row
+def party_op(row):
+    return UpdateOne(
+        {"name": row["name"]},
+        {"$set": {
+            "gstin": row["gstin"],
+            "place": row["place"],
+            "fixed_place": bool(row["fixed_place"])
+        }},
+        upsert=True
+    )
+
+
+def transport_op(row):
+    return UpdateOne({"name": row["name"]}, {"$set": {"gstin": row["gstin"]}}, upsert=True)
+
+
+def city_op(row):
+    return UpdateOne(
+        {"city": row["city"], "state": row["state"]},
+        {"$setOnInsert": {"city": row["city"], "state": row["state"]}},
+        upsert=True
+    )
 
 
-def migrate():
-    # --- Connect SQLite ---
-    sql_conn = sqlite3.connect(SQLITE_PATH)
-    sql_conn.row_factory = sqlite3.Row
-    cur = sql_conn.cursor()
+def pending_op(row):
+    return UpdateOne(
+        {"type": row["type"], "name": row["name"]},
+        {"$set": {"gstin": row["gstin"], "place": row["place"]}},
+        upsert=True
+    )
+
+
+TABLES = [
+    ("parties", ["name", "gstin", "place", "fixed_place"], "parties", party_op),
+    ("transports", ["name", "gstin"], "transports", transport_op),
+    ("cities", ["city", "state"], "cities", city_op),
+    ("pending_requests", ["type", "name", "gstin", "place"], "pending_requests", pending_op),
+]
+
+
+def migrate(sqlite_path=SQLITE_PATH, mongo_url=MONGO_URL, dry_run=False, workers=4,
+            chunk_size=1000, checkpoint=CHECKPOINT_PATH, restart=False):
+    def connect():
+        return sqlite3.connect(sqlite_path)
 
     # --- Connect Mongo ---
-    client = MongoClient(MONGO_URL)
+    client = MongoClient(mongo_url)
     db = client[DB_NAME]
 
-    parties = db["parties"]
-    transports = db["transports"]
-    cities = db["cities"]
-    pending = db["pending_requests"]
-
-    # Create indexes
-    parties.create_index([("name", ASCENDING)], unique=True)
-    transports.create_index([("name", ASCENDING)], unique=True)
-    cities.create_index([("city", ASCENDING), ("state", ASCENDING)], unique=True)
-    pending.create_index([("type", ASCENDING), ("name", ASCENDING)], unique=True)
-
-    print("Migrating parties...")
-    for row in cur.execute("SELECT name, gstin, place, fixed_place FROM parties"):
-        parties.update_one(
-            {"name": row["name"]},
-            {"$set": {
-                "gstin": row["gstin"],
-                "place": row["place"],
-                "fixed_place": bool(row["fixed_place"])
-            }},
-            upsert=True
-        )
+    if not dry_run:
+        # Create indexes
+        db["parties"].create_index([("name", ASCENDING)], unique=True)
+        db["transports"].create_index([("name", ASCENDING)], unique=True)
+        db["cities"].create_index([("city", ASCENDING), ("state", ASCENDING)], unique=True)
+        db["pending_requests"].create_index([("type", ASCENDING), ("name", ASCENDING)], unique=True)
 
-    print("Migrating transports...")
-    for row in cur.execute("SELECT name, gstin FROM transports"):
-        transports.update_one(
-            {"name": row["name"]},
-            {"$set": {"gstin": row["gstin"]}},
-            upsert=True
-        )
+    def writer(collection, make_op):
+        def write(rows):
+            collection.bulk_write([make_op(row) for row in rows], ordered=False)
+        return write
 
-    print("Migrating cities...")
-    for row in cur.execute("SELECT city, state FROM cities"):
-        cities.update_one(
-            {"city": row["city"], "state": row["state"]},
-            {"$setOnInsert": {
-                "city": row["city"],
-                "state": row["state"]
-            }},
-            upsert=True
+    tasks = [
+        MigrationTask(
+            table,
+            sqlite_count(connect, table),
+            sqlite_chunks(connect, table, columns),
+            writer(db[collection], make_op),
         )
+        for table, columns, collection, make_op in TABLES
+    ]
 
-    print("Migrating pending requests...")
-    for row in cur.execute("SELECT type, name, gstin, place FROM pending_requests"):
-        pending.update_one(
-            {"type": row["type"], "name": row["name"]},
-            {"$set": {
-                "gstin": row["gstin"],
-                "place": row["place"]
-            }},
-            upsert=True
-        )
+    print("Migrating " + ", ".join(t.name for t in tasks) + ("... (dry run)" if dry_run else "..."))
+    run_migration(tasks, checkpoint, dry_run=dry_run, workers=workers,
+                  chunk_size=chunk_size, restart=restart)
 
     print("\n🎉 Migration completed successfully!")
-    sql_conn.close()
+    client.close()
 
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description="Copy reference data from SQLite to MongoDB.")
+    parser.add_argument("--sqlite", default=SQLITE_PATH)
+    parser.add_argument("--mongo-url", default=MONGO_URL)
+    add_arguments(parser, CHECKPOINT_PATH)
+    args = parser.parse_args()
+    migrate(args.sqlite, args.mongo_url, args.dry_run, args.workers,
+            args.chunk_size, args.checkpoint, args.restart)
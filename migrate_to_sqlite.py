@@ -1,48 +1,30 @@
+import argparse
 import os
 import json
 import sqlite3
+from functools import lru_cache
 
-def migrate_json_to_sqlite(json_dir="data", db_path="data/data.db"):
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+from migration import MigrationTask, add_arguments, list_chunks, run_migration
+from storage import SQLiteStorage
+
+CHECKPOINT_PATH = "data/migrate_to_sqlite.checkpoint.json"
+
+
+def create_tables(db_path):
+    # Same schema and unique indexes the app's SQLite backend uses
+    store = SQLiteStorage(db_path)
+    store.ensure_indexes()
+    store.close()
 
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    # Create tables (same as DataManager)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS parties (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            gstin TEXT,
-            place TEXT,
-            fixed_place INTEGER DEFAULT 0
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS transports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            gstin TEXT
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS cities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            city TEXT,
-            state TEXT
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS pending_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT,
-            name TEXT,
-            gstin TEXT,
-            place TEXT
-        )
-    """)
+
+def migrate_json_to_sqlite(json_dir="data", db_path="data/data.db", dry_run=False, workers=4,
+                           chunk_size=1000, checkpoint=CHECKPOINT_PATH, restart=False):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if not dry_run:
+        create_tables(db_path)
 
     # Helper function
+    @lru_cache(maxsize=None)
     def load_json(filename):
         path = os.path.join(json_dir, filename)
         if os.path.exists(path):
@@ -53,57 +35,66 @@ def migrate_json_to_sqlite(json_dir="data", db_path="data/data.db"):
                     return {}
         return {}
 
-    # Migrate Parties
-    parties = load_json("parties.json")
-    for k, v in parties.items():
-        c.execute("""
-            INSERT OR IGNORE INTO parties (name, gstin, place, fixed_place)
-            VALUES (?, ?, ?, ?)
-        """, (
-            v.get("name", k),
-            v.get("gstin", ""),
-            v.get("place", ""),
-            int(v.get("fixed_place", False))
-        ))
-
-    # Migrate Transports
-    transports = load_json("transports.json")
-    for k, v in transports.items():
-        c.execute("""
-            INSERT OR IGNORE INTO transports (name, gstin)
-            VALUES (?, ?)
-        """, (
-            v.get("name", k),
-            v.get("gstin", "")
-        ))
-
-    # Migrate Cities
-    cities = load_json("cities.json")
-    for state, city_list in cities.items():
-        for city in city_list:
-            c.execute("""
-                INSERT INTO cities (city, state)
-                VALUES (?, ?)
-            """, (city, state))
-
-    # Migrate Pending Requests
-    pending = load_json("pending_requests.json")
-    for k, v in pending.items():
-        c.execute("""
-            INSERT INTO pending_requests (type, name, gstin, place)
-            VALUES (?, ?, ?, ?)
-        """, (
-            v.get("type", ""),
-            v.get("name", ""),
-            v.get("gstin", ""),
-            v.get("place", "")
-        ))
-
-    conn.commit()
-    conn.close()
+    # Rows per table, in file order, as the tuples the INSERT expects
+    def party_rows():
+        return [
+            (v.get("name", k), v.get("gstin", ""), v.get("place", ""), int(v.get("fixed_place", False)))
+            for k, v in load_json("parties.json").items()
+        ]
+
+    def transport_rows():
+        return [(v.get("name", k), v.get("gstin", "")) for k, v in load_json("transports.json").items()]
+
+    def city_rows():
+        return [
+            (city, state)
+            for state, city_list in load_json("cities.json").items()
+            for city in city_list
+        ]
+
+    def pending_rows():
+        return [
+            (v.get("type", ""), v.get("name", ""), v.get("gstin", ""), v.get("place", ""))
+            for k, v in load_json("pending_requests.json").items()
+        ]
+
+    def writer(sql):
+        def write(rows):
+            # One transaction per chunk; tables share the file, so wait on its lock
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                with conn:
+                    conn.executemany(sql, rows)
+            finally:
+                conn.close()
+        return write
+
+    def task(name, rows, sql):
+        rows = lru_cache(maxsize=None)(rows)
+        return MigrationTask(name, lambda: len(rows()), list_chunks(rows), writer(sql))
+
+    tasks = [
+        task("parties", party_rows,
+             "INSERT OR IGNORE INTO parties (name, gstin, place, fixed_place) VALUES (?, ?, ?, ?)"),
+        task("transports", transport_rows,
+             "INSERT OR IGNORE INTO transports (name, gstin) VALUES (?, ?)"),
+        task("cities", city_rows,
+             "INSERT OR IGNORE INTO cities (city, state) VALUES (?, ?)"),
+        task("pending_requests", pending_rows,
+             "INSERT OR IGNORE INTO pending_requests (type, name, gstin, place) VALUES (?, ?, ?, ?)"),
+    ]
+
+    run_migration(tasks, checkpoint, dry_run=dry_run, workers=workers,
+                  chunk_size=chunk_size, restart=restart)
 
     print("✅ Migration complete! Data successfully moved to", db_path)
 
 
 if __name__ == "__main__":
-    migrate_json_to_sqlite()
+    parser = argparse.ArgumentParser(description="Load the legacy JSON data files into SQLite.")
+    parser.add_argument("--json-dir", default="data")
+    parser.add_argument("--db", default="data/data.db")
+    add_arguments(parser, CHECKPOINT_PATH)
+    args = parser.parse_args()
+    migrate_json_to_sqlite(args.json_dir, args.db, args.dry_run, args.workers,
+                           args.chunk_size, args.checkpoint, args.restart)
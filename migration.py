@@ -0,0 +1,220 @@
+"""
+Small engine shared by the migration scripts.
+
+A migration is a list of MigrationTask objects, one per table. Each task
+reads its source in chunks that carry a resume position (e.g. the last
+SQLite rowid) and writes every chunk in one batch. Tables run concurrently
+on a thread pool. After each chunk the position is saved to a checkpoint
+file, so an interrupted run picks up where it stopped; the file is removed
+once every table has finished.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1000
+
+
+class MigrationTask:
+    """
+    name:   label used for progress and the checkpoint
+    count:  callable returning the number of source rows (for progress)
+    chunks: callable(after, chunk_size) yielding (position, rows); `after`
+            is the last saved position or None on a fresh start
+    write:  callable(rows) storing one chunk; skipped on a dry run
+    """
+
+    def __init__(self, name, count, chunks, write):
+        self.name = name
+        self.count = count
+        self.chunks = chunks
+        self.write = write
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def get(self, name):
+        return self.state.get(name, {})
+
+    def save(self, name, **entry):
+        with self._lock:
+            self.state[name] = entry
+            if not self.path:
+                return
+            # Write to a temp file and rename, so a crash never leaves half a file
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=folder)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """Per-table counters, redrawn on one line about once a second."""
+
+    def __init__(self, stream=sys.stdout, interval=1.0):
+        self.stream = stream
+        # Logs (not a terminal) get a full line every 10s instead of redraws
+        self.tty = stream.isatty()
+        self.interval = interval if self.tty else 10.0
+        self.tables = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, total, done):
+        with self._lock:
+            self.tables[name] = {"total": total, "done": done, "start_done": done}
+
+    def advance(self, name, rows):
+        with self._lock:
+            self.tables[name]["done"] += rows
+
+    def line(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        with self._lock:
+            parts = []
+            moved = 0
+            for name, t in self.tables.items():
+                pct = 100 * t["done"] / t["total"] if t["total"] else 100
+                parts.append(f"{name} {t['done']}/{t['total']} ({pct:.0f}%)")
+                moved += t["done"] - t["start_done"]
+        return " | ".join(parts) + f" | {moved / elapsed:.0f} rows/s"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.stream.write("\r" + self.line() if self.tty else self.line() + "\n")
+            self.stream.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.stream.write(("\r" if self.tty else "") + self.line() + "\n")
+        self.stream.flush()
+
+
+def _run_task(task, checkpoint, progress, chunk_size, dry_run):
+    saved = checkpoint.get(task.name)
+    if saved.get("finished"):
+        return
+    done = saved.get("rows", 0)
+    for position, rows in task.chunks(saved.get("position"), chunk_size):
+        if not dry_run:
+            task.write(rows)
+        done += len(rows)
+        progress.advance(task.name, len(rows))
+        if not dry_run:
+            checkpoint.save(task.name, position=position, rows=done)
+    if not dry_run:
+        checkpoint.save(task.name, position=None, rows=done, finished=True)
+
+
+def run_migration(tasks, checkpoint_path=None, dry_run=False, workers=4,
+                  chunk_size=CHUNK_SIZE, restart=False):
+    """Run every task to completion; returns the rows handled per table."""
+    checkpoint = Checkpoint(None if dry_run else checkpoint_path)
+    if restart:
+        checkpoint.clear()
+        checkpoint.state = {}
+    if checkpoint.state:
+        print(f"↻ Resuming from {checkpoint_path}")
+
+    progress = Progress()
+    for task in tasks:
+        saved = checkpoint.get(task.name)
+        progress.add(task.name, task.count(), saved.get("rows", 0))
+
+    progress.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [
+                pool.submit(_run_task, task, checkpoint, progress, chunk_size, dry_run)
+                for task in tasks
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        progress.stop()
+
+    if not dry_run:
+        checkpoint.clear()
+    return {name: t["done"] for name, t in progress.tables.items()}
+
+
+def add_arguments(parser, checkpoint):
+    """Command-line flags shared by the migration scripts."""
+    parser.add_argument("--dry-run", action="store_true", help="read and convert only, write nothing")
+    parser.add_argument("--workers", type=int, default=4, help="tables migrated in parallel")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per batch")
+    parser.add_argument("--checkpoint", default=checkpoint, help="progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore a saved checkpoint")
+
+
+# ---------- SQLite sources ----------
+def sqlite_chunks(connect, table, columns):
+    """
+    Chunk reader for a SQLite table, keyed on rowid so every chunk is an
+    index range scan and the last rowid is the resume position. `connect`
+    opens a new connection; each table thread needs its own.
+    """
+    def chunks(after, chunk_size):
+        conn = connect()
+        try:
+            last = after or 0
+            while True:
+                rows = conn.execute(
+                    f"SELECT rowid, {', '.join(columns)} FROM {table} "
+                    f"WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, chunk_size),
+                ).fetchall()
+                if not rows:
+                    return
+                last = rows[-1][0]
+                yield last, [dict(zip(columns, row[1:])) for row in rows]
+        finally:
+            conn.close()
+    return chunks
+
+
+def sqlite_count(connect, table):
+    def count():
+        conn = connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+    return count
+
+
+# ---------- In-memory sources ----------
+def list_chunks(load):
+    """Chunk reader over a list returned by load(); the position is the offset."""
+    def chunks(after, chunk_size):
+        rows = load()
+        start = after or 0
+        for offset in range(start, len(rows), chunk_size):
+            batch = rows[offset:offset + chunk_size]
+            yield offset + len(batch), batch
+    return chunks
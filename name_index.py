@@ -0,0 +1,102 @@
+"""
+In-memory typeahead index over party / transport names.
+
+Names are normalized (upper case, punctuation folded to spaces) and every
+word is stored in a sorted list, so a prefix lookup is two bisects. A query
+matches a name when each query word is a prefix of one of the name's words,
+e.g. "gan tex" finds "SHREE GANESH TEXTILES". Names that start with the
+query are ranked first.
+
+A name can be indexed under other text than itself, e.g. the city label
+"Navi Mumbai (M.)" under "Navi Mumbai Maharashtra": pass a mapping of
+name -> text instead of plain names.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+_SPLIT = re.compile(r"[^0-9A-Z]+")
+
+
+def normalize(text):
+    return " ".join(_SPLIT.split(str(text or "").upper())).strip()
+
+
+class PrefixIndex:
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self.rebuild(names)
+
+    def rebuild(self, names):
+        """Replace the contents with `names` (or a {name: text} mapping)."""
+        items = names.items() if isinstance(names, dict) else ((name, name) for name in names)
+        entries = set()
+        keys = {}
+        for name, text in items:
+            key = normalize(text)
+            if key:
+                keys[name] = key
+                entries.update((word, name) for word in key.split())
+        with self._lock:
+            self._words = sorted(entries)
+            self._keys = keys
+            self._ordered = None  # all names by key, for empty queries
+            self.built = time.time()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def add(self, name, text=None):
+        key = normalize(name if text is None else text)
+        if not key:
+            return
+        with self._lock:
+            if name in self._keys:
+                return
+            self._keys[name] = key
+            self._ordered = None
+            for word in set(key.split()):
+                insort(self._words, (word, name))
+
+    def remove(self, name):
+        with self._lock:
+            key = self._keys.pop(name, None)
+            if key is None:
+                return
+            self._ordered = None
+            for word in set(key.split()):
+                i = bisect_left(self._words, (word, name))
+                if i < len(self._words) and self._words[i] == (word, name):
+                    del self._words[i]
+
+    def _prefix_range(self, prefix):
+        start = bisect_left(self._words, (prefix,))
+        # "\uffff" sorts after every character a normalized word can hold
+        end = bisect_left(self._words, (prefix + "\uffff",))
+        return start, end
+
+    def search(self, query, offset=0, limit=20):
+        """Return (names, more) for one page of matches."""
+        query = normalize(query)
+        with self._lock:
+            if not query:
+                if self._ordered is None:
+                    self._ordered = sorted(self._keys, key=self._keys.get)
+                matches = self._ordered
+            else:
+                words = query.split()
+                # Narrow with the most selective word, then check the others
+                start, end = min((self._prefix_range(q) for q in words), key=lambda r: r[1] - r[0])
+                candidates = {name for _, name in self._words[start:end]}
+                if len(words) > 1:
+                    candidates = [
+                        name for name in candidates
+                        if all(any(w.startswith(q) for w in self._keys[name].split()) for q in words)
+                    ]
+                matches = list(candidates)
+                matches.sort(key=lambda name: (not self._keys[name].startswith(query), self._keys[name]))
+        return matches[offset:offset + limit], len(matches) > offset + limit
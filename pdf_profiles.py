@@ -0,0 +1,47 @@
+"""
+PDF output profiles: how an invoice is written, not what is on it.
+
+    compressed     deflate-compressed page streams, base-14 fonts (default)
+    uncompressed   plain page streams, base-14 fonts; larger, but diffable
+    embedded       compressed, with subsets of Bitstream Vera (shipped with
+                   ReportLab) embedded instead of base-14 Helvetica, so
+                   every viewer shows the same glyphs
+    pdfa           embedded fonts plus document info, language and a single
+                   RGB colour space, as PDF/A requires; ReportLab's open
+                   source edition writes no XMP metadata or output intent,
+                   so files still need a conversion step to claim PDF/A
+
+Base-14 fonts cost no bytes, as every viewer ships them; embedded subsets add
+about 40 KB per invoice. `python -m benchmarks.bench_pdf_profiles`
+compares size and render time.
+
+PDF_PROFILE selects the profile the app renders with. It is kept apart from
+bill_template so the app can use it (e.g. in archive keys) without importing
+ReportLab.
+"""
+import os
+
+PROFILES = {
+    "compressed": {"compress": True, "embed_fonts": False, "archival": False},
+    "uncompressed": {"compress": False, "embed_fonts": False, "archival": False},
+    "embedded": {"compress": True, "embed_fonts": True, "archival": False},
+    "pdfa": {"compress": True, "embed_fonts": True, "archival": True},
+}
+
+DEFAULT_PROFILE = "compressed"
+PDF_PROFILE = os.environ.get("PDF_PROFILE", DEFAULT_PROFILE).lower()
+
+if PDF_PROFILE not in PROFILES:
+    raise ValueError(f"Unknown PDF_PROFILE: {PDF_PROFILE} (choose from {', '.join(PROFILES)})")
+
+# Rendered PDFs stay in memory up to this size, then spill to a temp file
+PDF_SPOOL_MAX_BYTES = int(os.environ.get("PDF_SPOOL_MAX_BYTES", 512 * 1024))
+
+
+def get_profile(name=None):
+    """Settings of a profile by name (default: PDF_PROFILE)."""
+    name = (name or PDF_PROFILE).lower()
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF profile: {name}") from None
@@ -0,0 +1,103 @@
+"""
+Read-through cache for reference data (parties, transports, bank details).
+
+Entries are evicted least-recently-used once the cache is full and expire
+after a TTL. Coherence across worker processes comes from a version number
+in the storage backend that every write path bumps: each worker re-reads it at most every
+poll interval and drops its entries when it has moved.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+REFERENCE_CACHE_SIZE = int(os.environ.get("REFERENCE_CACHE_SIZE", 2048))
+REFERENCE_CACHE_TTL = float(os.environ.get("REFERENCE_CACHE_TTL", 300))
+REFERENCE_VERSION_POLL = float(os.environ.get("REFERENCE_VERSION_POLL", 2))
+
+_MISSING = object()
+
+
+class ReferenceCache:
+    def __init__(self, max_size=REFERENCE_CACHE_SIZE, ttl=REFERENCE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, load):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class VersionWatch:
+    """
+    Tracks the shared reference-data version kept by a storage backend
+    (see storage.py). changed() reads it at most every `poll` seconds.
+    """
+
+    def __init__(self, store, poll=REFERENCE_VERSION_POLL):
+        self.store = store
+        self.poll = poll
+        self.version = None
+        self._checked = 0.0
+
+    def changed(self):
+        now = time.time()
+        if now - self._checked < self.poll:
+            return False
+        self._checked = now
+        version = self.store.read_version()
+        moved = self.version is not None and version != self.version
+        self.version = version
+        return moved
+
+    def bump(self):
+        self.version = self.store.bump_version()
+        self._checked = time.time()
+        return self.version
@@ -0,0 +1,271 @@
+"""
+Background render queue for /download, and the process pool /download_batch
+renders on.
+
+LocalRenderQueue renders jobs on a small process pool in the worker that
+accepted them, so it needs no external broker. The queue is bounded, every
+job has a timeout, and finished PDFs are dropped after a TTL.
+
+RENDER_JOB_STORE says where the other workers can find a job: "memory"
+(default; only this process, fine for a single worker) or "mongo" (job state
+and the finished PDF in the render_jobs collection, so a poll may land on any
+worker). gunicorn.conf.py picks "mongo" when it runs more than one worker.
+
+BatchRenderPool holds one pool of BATCH_RENDER_WORKERS processes per worker,
+shared by every batch that worker is streaming.
+"""
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import cached_property
+
+RENDER_QUEUE_SIZE = int(os.environ.get("RENDER_QUEUE_SIZE", 50))
+RENDER_QUEUE_WORKERS = int(os.environ.get("RENDER_QUEUE_WORKERS", 2))
+RENDER_JOB_TIMEOUT = float(os.environ.get("RENDER_JOB_TIMEOUT", 60))
+RENDER_JOB_TTL = float(os.environ.get("RENDER_JOB_TTL", 600))
+RENDER_JOB_STORE = os.environ.get("RENDER_JOB_STORE", "memory").lower()
+BATCH_RENDER_WORKERS = int(os.environ.get("BATCH_RENDER_WORKERS", os.cpu_count() or 1))
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _render_with_timeout(data, banks, timeout):
+    """Runs in a worker process; SIGALRM aborts renders that overrun."""
+    from bill_template import render_invoice_pdf  # ReportLab loads in the worker only
+
+    def _expired(signum, frame):
+        raise TimeoutError(f"render exceeded {timeout:g}s")
+
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _expired)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return render_invoice_pdf(data, banks)
+    finally:
+        if hasattr(signal, "SIGALRM"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class RenderJob:
+    def __init__(self, data, archive_key=None):
+        self.id = uuid.uuid4().hex
+        self.data = data
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self.pdf = None
+        self.total = None
+        self.error = None
+        self.archive_key = archive_key
+        self._status = "queued"
+
+    FIELDS = ["data", "created", "finished", "pdf", "total", "error", "archive_key"]
+
+    def to_doc(self):
+        return {"_id": self.id, "status": self._status, **{f: getattr(self, f) for f in self.FIELDS}}
+
+    @classmethod
+    def from_doc(cls, doc):
+        job = cls(doc["data"])
+        job.id, job._status = doc["_id"], doc["status"]
+        for field in cls.FIELDS:
+            setattr(job, field, doc.get(field))
+        return job
+
+    @property
+    def status(self):
+        if self._status == "queued" and self.future is not None and self.future.running():
+            return "running"
+        return self._status
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "invoice_no": self.data.get("invoice_no", ""),
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class MongoJobStore:
+    """Job state and finished PDFs in Mongo, readable from every worker."""
+
+    def __init__(self, get_collection, name="render_jobs"):
+        # Resolved on first use, so choosing this store opens no connection
+        self._get_collection = get_collection
+        self.name = name
+
+    @cached_property
+    def jobs(self):
+        jobs = self._get_collection(self.name)
+        jobs.create_index("expires", expireAfterSeconds=0)
+        return jobs
+
+    def save(self, job, expires):
+        doc = job.to_doc()
+        doc["expires"] = datetime.utcfromtimestamp(expires)
+        self.jobs.replace_one({"_id": job.id}, doc, upsert=True)
+
+    def load(self, job_id):
+        doc = self.jobs.find_one({"_id": job_id})
+        return RenderJob.from_doc(doc) if doc else None
+
+    def reset(self):
+        self.__dict__.pop("jobs", None)  # bound to the parent's client after a fork
+
+
+def get_job_store():
+    """Job store selected by RENDER_JOB_STORE, or None to keep jobs in memory."""
+    if RENDER_JOB_STORE == "memory":
+        return None
+    if RENDER_JOB_STORE != "mongo":
+        raise ValueError(f"Unknown RENDER_JOB_STORE: {RENDER_JOB_STORE}")
+    from db import get_collection
+    return MongoJobStore(get_collection)
+
+
+class LocalRenderQueue:
+    def __init__(self, max_size=RENDER_QUEUE_SIZE, workers=RENDER_QUEUE_WORKERS,
+                 timeout=RENDER_JOB_TIMEOUT, ttl=RENDER_JOB_TTL, store=None, on_done=None):
+        self.max_size = max_size
+        self.workers = workers
+        self.timeout = timeout
+        self.ttl = ttl
+        self.store = store
+        self.on_done = on_done  # called with each successfully rendered job
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        # Created on first use so the pool is never inherited across a fork
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def submit(self, data, banks, archive_key=None):
+        """Queue one invoice; raises QueueFull when max_size jobs are pending."""
+        with self._lock:
+            self._expire()
+            active = sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+            if active >= self.max_size:
+                raise QueueFull(f"render queue is full ({self.max_size} jobs)")
+
+            job = RenderJob(data, archive_key)
+            if self.store:
+                # Visible to the other workers before anyone can poll for it
+                self.store.save(job, job.created + self.timeout + self.ttl)
+            self._jobs[job.id] = job
+            job.future = self._get_pool().submit(_render_with_timeout, data, banks, self.timeout)
+
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def _finish(self, job, future):
+        with self._lock:
+            if job._status != "queued":
+                return
+            job.finished = time.time()
+            if future.cancelled():
+                job._status, job.error = "failed", "cancelled"
+            else:
+                error = future.exception()
+                if isinstance(error, TimeoutError):
+                    job._status, job.error = "timeout", str(error)
+                elif error is not None:
+                    job._status, job.error = "failed", str(error)
+                else:
+                    job.pdf, job.total = future.result()
+                    job._status = "done"
+        if job._status == "done" and self.on_done:
+            try:
+                self.on_done(job)
+            except Exception as e:
+                print(f"⚠️ Render job {job.id} finished, but on_done failed: {e}")
+        self._publish(job)
+
+    def _publish(self, job):
+        if self.store:
+            try:
+                self.store.save(job, job.finished + self.ttl)
+            except Exception as e:
+                print(f"⚠️ Could not store render job {job.id}: {e}")
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            expired = job and job._status == "queued" and time.time() - job.created > self.timeout
+            if expired:
+                # Still waiting for a worker (or stuck) past its deadline
+                job.future.cancel()
+                job._status, job.error = "timeout", f"job exceeded {self.timeout:g}s"
+                job.finished = time.time()
+        if expired:
+            self._publish(job)
+        if job is None and self.store:
+            # Accepted by another worker
+            job = self.store.load(job_id)
+            if job and job._status == "queued" and time.time() - job.created > self.timeout:
+                job._status, job.error = "timeout", f"job exceeded {self.timeout:g}s"
+        return job
+
+    def _expire(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.finished and now - j.finished > self.ttl]:
+            del self._jobs[job_id]
+
+    def reset(self):
+        """Forget the parent's jobs and store connection; call after a fork."""
+        with self._lock:
+            self._jobs.clear()
+        if self.store:
+            self.store.reset()
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+class BatchRenderPool:
+    """
+    Process pool for batch renders. Concurrent batches queue for the same
+    processes instead of each starting cpu_count() of its own.
+    """
+
+    def __init__(self, workers=BATCH_RENDER_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        # Created on first use so the pool is never inherited across a fork
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def discard(self, pool):
+        """Drop a broken pool (a process died) so the next batch starts a new one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def reset(self):
+        """Forget the parent's pool; call after a fork."""
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
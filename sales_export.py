@@ -0,0 +1,156 @@
+"""
+Sales register (CSV) and GSTR-1 (JSON) exports for a date range.
+
+Both exports are generators over a Mongo cursor that yield text in chunks,
+so Flask can stream them and memory stays flat however many invoices the
+range holds. Parties are split the way format_gstin already stores them:
+a plain GSTIN is B2B, anything prefixed "URP-" (PAN, Aadhaar, unregistered)
+is B2C.
+"""
+import csv
+import io
+import json
+
+import invoice_math
+
+from invoice_math import SELLER_GSTIN, SELLER_STATE, is_registered, place_of_supply
+
+CHUNK_ROWS = 500
+
+REGISTER_HEADER = [
+    "Invoice No", "Invoice Date", "Party Name", "Party GSTIN", "Type",
+    "Place of Supply", "Place", "Taxable Value", "Rate", "IGST", "CGST", "SGST", "Invoice Value",
+]
+
+
+def _money(value):
+    return round(float(value or 0), 2)
+
+
+def _rate(rate_bp):
+    """GST rate in percent, as the return expects it (500 -> 5, 250 -> 2.5)."""
+    return rate_bp // 100 if rate_bp % 100 == 0 else rate_bp / 100
+
+
+def _tax_amounts(row, mode):
+    """
+    (IGST, CGST, SGST) in rupees for an invoice or a by-rate total, split
+    the way it was charged (see invoice_math.gst_mode_for), so the exports
+    match the printed bills.
+    """
+    if mode == "CGST_SGST":
+        return 0, row.get("cgst_paise", 0) / 100, row.get("sgst_paise", 0) / 100
+    return _money(row.get("gst")), 0, 0
+
+
+# ---------- Sales register (CSV) ----------
+def sales_register_csv(invoices):
+    """Yield the sales register as CSV text, CHUNK_ROWS rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REGISTER_HEADER)
+
+    for n, inv in enumerate(invoices, 1):
+        gstin = inv.get("party_gstin", "")
+        mode, rate_bp = invoice_math.stored_gst(inv)
+        igst, cgst, sgst = _tax_amounts(inv, mode)
+        writer.writerow([
+            inv["invoice_no"],
+            inv["invoice_date"].strftime("%d/%m/%Y") if inv.get("invoice_date") else "",
+            inv.get("party_name", ""),
+            gstin,
+            "B2B" if is_registered(gstin) else "B2C",
+            place_of_supply(gstin),
+            inv.get("place", ""),
+            f"{_money(inv.get('taxable')):.2f}",
+            _rate(rate_bp),
+            f"{igst:.2f}",
+            f"{cgst:.2f}",
+            f"{sgst:.2f}",
+            f"{_money(inv.get('grand_total')):.2f}",
+        ])
+        if n % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# ---------- GSTR-1 (JSON) ----------
+def _supply_fields(row, mode):
+    igst, cgst, sgst = _tax_amounts(row, mode)
+    if mode == "CGST_SGST":
+        return {"sply_ty": "INTRA", "camt": cgst, "samt": sgst}
+    return {"sply_ty": "INTER", "iamt": igst}
+
+
+def _b2b_invoice(inv):
+    mode, rate_bp = invoice_math.stored_gst(inv)
+    tax = _supply_fields(inv, mode)
+    del tax["sply_ty"]  # implied by pos in a B2B invoice
+    return {
+        "inum": inv["invoice_no"],
+        "idt": inv["invoice_date"].strftime("%d-%m-%Y") if inv.get("invoice_date") else "",
+        "val": _money(inv.get("grand_total")),
+        "pos": place_of_supply(inv["party_gstin"]),
+        "rchrg": "N",
+        "inv_typ": "R",
+        "itms": [{
+            "num": rate_bp + 1,
+            "itm_det": {
+                "txval": _money(inv.get("taxable")),
+                "rt": _rate(rate_bp),
+                **tax,
+                "csamt": 0,
+            },
+        }],
+    }
+
+
+def gstr1_json(b2b_invoices, b2c_totals, period):
+    """
+    Yield a GSTR-1 document as JSON text.
+
+    b2b_invoices must be ordered by party GSTIN, so each "ctin" block can be
+    opened and closed while streaming. b2c_totals is the pre-aggregated sum
+    of the unregistered invoices (see DatabaseManager.sum_invoices), which
+    the return reports as a single B2CS line per place of supply and rate.
+    """
+    yield '{"gstin":%s,"fp":%s,"b2b":[' % (json.dumps(SELLER_GSTIN), json.dumps(period))
+
+    ctin = None
+    chunk = []
+    for inv in b2b_invoices:
+        if inv["party_gstin"] != ctin:
+            if ctin is not None:
+                chunk.append("]},")
+            ctin = inv["party_gstin"]
+            chunk.append('{"ctin":%s,"inv":[' % json.dumps(ctin))
+        else:
+            chunk.append(",")
+        chunk.append(json.dumps(_b2b_invoice(inv), separators=(",", ":")))
+        if len(chunk) >= CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+    if ctin is not None:
+        chunk.append("]}")
+    chunk.append("],")
+    yield "".join(chunk)
+
+    b2cs = []
+    for totals in b2c_totals:
+        if not totals.get("invoices"):
+            continue
+        tax = _supply_fields(totals, totals["gst_mode"])
+        b2cs.append({
+            "sply_ty": tax.pop("sply_ty"),
+            "pos": SELLER_STATE,
+            "typ": "OE",
+            "rt": _rate(totals["gst_rate_bp"]),
+            "txval": _money(totals["taxable"]),
+            **tax,
+            "csamt": 0,
+        })
+    yield '"b2cs":%s}' % json.dumps(b2cs, separators=(",", ":"))
@@ -0,0 +1,517 @@
+"""
+Storage backends for reference data: parties, transports, cities, bank
+details, pending requests and the shared reference-data version.
+
+STORAGE_BACKEND selects one: "mongo" (default, the Atlas collections) or
+"sqlite" (a local file at SQLITE_PATH, for single-shop deployments that
+want lookups without a network round trip). Invoices and their rollups
+stay in Mongo either way, so the sales register and GSTR-1 exports, the GST
+summary, the totals audit and /invoice/<no> need Mongo even with sqlite.
+Without it bills still render and download; they are just not recorded.
+
+Both backends take writes as the (filter, update) upserts built in
+data_manager, with "$set" (insert or update) or "$setOnInsert" (insert
+only), so single adds, bulk imports and approvals write the same rows.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConfigurationError, DuplicateKeyError, OperationFailure
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "data/data.db")
+
+# Metrics phase for storage calls (see metrics.timed_phase)
+PHASE = "sqlite" if STORAGE_BACKEND == "sqlite" else "mongo"
+
+# Columns per table (besides the id) and the fields a row is unique on
+TABLE_COLUMNS = {
+    "parties": ["name", "gstin", "place", "fixed_place"],
+    "transports": ["name", "gstin"],
+    "cities": ["city", "state"],
+    "pending_requests": ["type", "name", "gstin", "place"],
+    "bank_details": ["bank_name", "account_number", "ifsc"],
+}
+TABLE_KEYS = {
+    "parties": ["name"],
+    "transports": ["name"],
+    "cities": ["city", "state"],
+    "pending_requests": ["type", "name"],
+}
+
+VERSION_KEY = "reference_version"
+
+
+def _split_upsert(filter_, update):
+    """(key fields, other fields, insert_only) of one (filter, update) upsert."""
+    if "$setOnInsert" in update:
+        fields = {k: v for k, v in update["$setOnInsert"].items() if k not in filter_}
+        return dict(filter_), fields, True
+    return dict(filter_), dict(update.get("$set", {})), False
+
+
+def _with_id(doc, record_id):
+    doc["id"] = str(record_id)
+    return doc
+
+
+# ---------- Mongo ----------
+class MongoStorage:
+    def __init__(self):
+        from db import get_collection
+
+        self._get_collection = get_collection
+
+    def collection(self, table):
+        return self._get_collection(table)
+
+    @property
+    def parties(self):
+        return self.collection("parties")
+
+    @property
+    def transports(self):
+        return self.collection("transports")
+
+    @property
+    def cities(self):
+        return self.collection("cities")
+
+    @property
+    def pending(self):
+        return self.collection("pending_requests")
+
+    @property
+    def meta(self):
+        return self.collection("meta")
+
+    def ensure_indexes(self):
+        for table, keys in TABLE_KEYS.items():
+            self.collection(table).create_index([(k, ASCENDING) for k in keys], unique=True)
+
+    def reset(self):
+        pass  # collections are looked up per call, from the current client
+
+    # Lookups
+    def find_one(self, table, key):
+        return self.collection(table).find_one(key, {"_id": 0})
+
+    def names(self, table):
+        return [d["name"] for d in self.collection(table).find({}, {"_id": 0, "name": 1})]
+
+    def rows(self, table):
+        return list(self.collection(table).find({}, {"_id": 0}))
+
+    # Writes
+    def upsert(self, table, filter_, update):
+        self.collection(table).update_one(filter_, update, upsert=True)
+
+    def bulk_upsert(self, table, upserts, session=None):
+        """Unordered bulk_write; returns (inserted, matched, errors by position)."""
+        if not upserts:
+            return 0, 0, {}
+        ops = [UpdateOne(f, u, upsert=True) for f, u in upserts]
+        try:
+            details = self.collection(table).bulk_write(ops, ordered=False, session=session).bulk_api_result
+        except BulkWriteError as e:
+            if session is not None:
+                raise  # abort the transaction
+            details = e.details
+        errors = {err["index"]: err.get("errmsg", "write failed") for err in details.get("writeErrors", [])}
+        return details.get("nUpserted", 0), details.get("nMatched", 0), errors
+
+    # Pending requests
+    def add_pending(self, type_, name, gstin, place):
+        # The (type, name) unique index settles races between concurrent requests
+        try:
+            result = self.pending.update_one(
+                {"type": type_, "name": name},
+                {"$setOnInsert": {"gstin": gstin, "place": place}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return result.upserted_id is not None
+
+    def list_pending(self):
+        return list(self.pending.find({}, {"_id": 0}).sort("_id", -1))
+
+    def find_pending(self, keys):
+        """{(type, name): row} for the pending requests among `keys`."""
+        match = {"$or": [{"type": t, "name": n} for t, n in set(keys)]}
+        return {(r["type"], r["name"]): r for r in self.pending.find(match)}
+
+    def resolve_pending(self, rows, upserts):
+        """
+        Apply the approvals' upserts ({table: [(filter, update)]}) and delete
+        the pending rows, in one transaction where the server supports it
+        (replica sets such as Atlas).
+        """
+        def apply(session=None):
+            for table, ops in upserts.items():
+                if ops:
+                    self.bulk_upsert(table, ops, session=session)
+            if rows:
+                self.pending.delete_many(
+                    {"_id": {"$in": [r["_id"] for r in rows.values()]}}, session=session
+                )
+
+        self._in_transaction(apply)
+
+    def _in_transaction(self, fn):
+        """Run fn(session) in a transaction, or fn() where the server has none."""
+        client = self.pending.database.client
+        try:
+            with client.start_session() as session:
+                session.with_transaction(lambda s: fn(s))
+                return
+        except (ConfigurationError, NotImplementedError):
+            pass
+        except OperationFailure as e:
+            # Standalone servers reject transactions before anything is written
+            if e.code not in (20, 263):  # IllegalOperation, OperationNotSupportedInTransaction
+                raise
+        fn()
+
+    def delete_pending(self, type_, name):
+        self.pending.delete_one({"type": type_, "name": name})
+
+    # Reference-data version
+    def read_version(self):
+        doc = self.meta.find_one({"_id": VERSION_KEY})
+        return doc["v"] if doc else 0
+
+    def bump_version(self):
+        doc = self.meta.find_one_and_update(
+            {"_id": VERSION_KEY}, {"$inc": {"v": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return doc["v"]
+
+    # Admin table browser
+    def page(self, table, after=None, filters=None, q="", search=None, fields=None, limit=100):
+        """
+        Documents in _id order after the `after` id, as dicts with a string
+        "id": equal to every `filters` value and, with `q`, containing it in
+        one of the `search` fields. Raises ValueError for a malformed `after`.
+        """
+        query = dict(filters or {})
+        if after:
+            try:
+                query["_id"] = {"$gt": ObjectId(after)}
+            except (InvalidId, TypeError):
+                raise ValueError("invalid cursor")
+        if q:
+            pattern = re.compile(re.escape(q), re.IGNORECASE)
+            query["$or"] = [{field: pattern} for field in search or TABLE_COLUMNS[table]]
+        projection = {f: 1 for f in fields} if fields else None
+
+        # _id order is stable and served by the default index, so every page
+        # is a short range scan however large the collection gets
+        cursor = self.collection(table).find(query, projection).sort("_id", 1).limit(limit)
+        return (_with_id(doc, doc.pop("_id")) for doc in cursor)
+
+    def insert(self, table, doc):
+        self.collection(table).insert_one(dict(doc))
+
+    def delete(self, table, record_id):
+        """Delete by id and return the deleted row, or None if there was none."""
+        try:
+            obj_id = ObjectId(record_id)
+        except (InvalidId, TypeError):
+            raise ValueError("invalid record id")
+        return self.collection(table).find_one_and_delete({"_id": obj_id})
+
+
+# ---------- SQLite ----------
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS parties (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        gstin TEXT,
+        place TEXT,
+        fixed_place INTEGER DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS transports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        gstin TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS cities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT,
+        state TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS pending_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT,
+        name TEXT,
+        gstin TEXT,
+        place TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS bank_details (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bank_name TEXT NOT NULL,
+        account_number TEXT NOT NULL,
+        ifsc TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )""",
+]
+
+# Unique indexes; files written before they existed may hold duplicates,
+# so those are dropped first (keeping the oldest row)
+UNIQUE_INDEXES = {
+    "cities_city_state": ("cities", ("city", "state")),
+    "pending_type_name": ("pending_requests", ("type", "name")),
+}
+
+
+class SQLiteStorage:
+    """
+    One connection per thread (and per process, so a forked worker opens
+    its own) in WAL mode: readers never wait for the writer, and several
+    workers can share the file. Every statement is a fixed SQL string with
+    ? parameters, so sqlite3's per-connection statement cache compiles each
+    one once.
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._sql = {}  # (table, kind, key, fields) -> statement text
+        self._schema_pid = None
+        self._schema_lock = threading.Lock()
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, cached_statements=256,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at each WAL checkpoint
+            local.conn, local.pid = conn, os.getpid()
+            # Tables must exist before the first query, even with SKIP_INDEX_SETUP
+            if self._schema_pid != os.getpid():
+                self._create_schema(conn)
+        return local.conn
+
+    def _create_schema(self, conn):
+        with self._schema_lock:
+            if self._schema_pid == os.getpid():
+                return
+            existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            with conn:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                for name, (table, columns) in UNIQUE_INDEXES.items():
+                    if name in existing:
+                        continue
+                    cols = ", ".join(columns)
+                    conn.execute(f"DELETE FROM {table} WHERE id NOT IN "
+                                 f"(SELECT MIN(id) FROM {table} GROUP BY {cols})")
+                    conn.execute(f"CREATE UNIQUE INDEX {name} ON {table} ({cols})")
+            self._schema_pid = os.getpid()
+
+    def ensure_indexes(self):
+        self._conn()  # creates the schema on first use
+
+    def reset(self):
+        self._local = threading.local()
+
+    def close(self):
+        if getattr(self._local, "pid", None) == os.getpid():
+            self._local.conn.close()
+        self.reset()
+
+    @staticmethod
+    def _doc(row):
+        doc = dict(row)
+        doc.pop("id", None)
+        if "fixed_place" in doc:
+            doc["fixed_place"] = bool(doc["fixed_place"])
+        return doc
+
+    def _columns(self, table, fields):
+        unknown = [f for f in fields if f not in TABLE_COLUMNS[table]]
+        if unknown:
+            raise ValueError(f"unknown field for {table}: {', '.join(unknown)}")
+        return ", ".join(fields)
+
+    def _statement(self, table, kind, key, fields=()):
+        """Statement text, built once per shape so it is always the same string."""
+        sql = self._sql.get((table, kind, key, fields))
+        if sql is None:
+            where = " AND ".join(f"{k} = ?" for k in key)
+            if kind == "select":
+                self._columns(table, key)
+                sql = f"SELECT * FROM {table} WHERE {where}"
+            elif kind == "insert":
+                columns = key + fields
+                sql = (f"INSERT INTO {table} ({self._columns(table, columns)}) "
+                       f"VALUES ({', '.join('?' * len(columns))}) ON CONFLICT DO NOTHING")
+            elif kind == "update":
+                self._columns(table, fields)
+                sql = f"UPDATE {table} SET {', '.join(f'{f} = ?' for f in fields)} WHERE {where}"
+            else:
+                sql = f"DELETE FROM {table} WHERE {where}"
+            self._sql[(table, kind, key, fields)] = sql
+        return sql
+
+    # Lookups
+    def find_one(self, table, key):
+        fields = tuple(key)
+        row = self._conn().execute(self._statement(table, "select", fields), tuple(key.values())).fetchone()
+        return self._doc(row) if row else None
+
+    def names(self, table):
+        return [r[0] for r in self._conn().execute(f"SELECT name FROM {table}")]
+
+    def rows(self, table):
+        return [self._doc(r) for r in self._conn().execute(f"SELECT * FROM {table} ORDER BY id")]
+
+    # Writes
+    def _upsert(self, conn, table, filter_, update):
+        """Returns True if the row was inserted, False if it existed."""
+        key, fields, insert_only = _split_upsert(filter_, update)
+        key_names, field_names = tuple(key), tuple(fields)
+        values = tuple(key.values()) + tuple(fields.values())
+        if conn.execute(self._statement(table, "insert", key_names, field_names), values).rowcount:
+            return True
+        if field_names and not insert_only:
+            conn.execute(self._statement(table, "update", key_names, field_names),
+                         tuple(fields.values()) + tuple(key.values()))
+        return False
+
+    def upsert(self, table, filter_, update):
+        conn = self._conn()
+        with conn:
+            self._upsert(conn, table, filter_, update)
+
+    def bulk_upsert(self, table, upserts):
+        """All rows in one transaction; a failing row is reported, not fatal."""
+        inserted = matched = 0
+        errors = {}
+        conn = self._conn()
+        with conn:
+            for i, (filter_, update) in enumerate(upserts):
+                try:
+                    if self._upsert(conn, table, filter_, update):
+                        inserted += 1
+                    else:
+                        matched += 1
+                except (sqlite3.Error, ValueError) as e:
+                    errors[i] = str(e)
+        return inserted, matched, errors
+
+    # Pending requests
+    def add_pending(self, type_, name, gstin, place):
+        conn = self._conn()
+        with conn:
+            return self._upsert(conn, "pending_requests", {"type": type_, "name": name},
+                                {"$setOnInsert": {"gstin": gstin, "place": place}})
+
+    def list_pending(self):
+        return [self._doc(r) for r in self._conn().execute(
+            "SELECT type, name, gstin, place FROM pending_requests ORDER BY id DESC")]
+
+    def find_pending(self, keys):
+        rows = {}
+        conn = self._conn()
+        select = self._statement("pending_requests", "select", ("type", "name"))
+        for key in set(keys):
+            row = conn.execute(select, key).fetchone()
+            if row:
+                rows[key] = dict(row)
+        return rows
+
+    def resolve_pending(self, rows, upserts):
+        conn = self._conn()
+        with conn:  # one transaction: all applied or none
+            for table, ops in upserts.items():
+                for filter_, update in ops:
+                    self._upsert(conn, table, filter_, update)
+            conn.executemany("DELETE FROM pending_requests WHERE id = ?", [(r["id"],) for r in rows.values()])
+
+    def delete_pending(self, type_, name):
+        conn = self._conn()
+        with conn:
+            conn.execute(self._statement("pending_requests", "delete", ("type", "name")), (type_, name))
+
+    # Reference-data version
+    def read_version(self):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (VERSION_KEY,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, 1) "
+                         "ON CONFLICT (key) DO UPDATE SET value = value + 1", (VERSION_KEY,))
+            return conn.execute("SELECT value FROM meta WHERE key = ?", (VERSION_KEY,)).fetchone()[0]
+
+    # Admin table browser
+    def page(self, table, after=None, filters=None, q="", search=None, fields=None, limit=100):
+        where, params = [], []
+        if after:
+            try:
+                params.append(int(after))
+            except (TypeError, ValueError):
+                raise ValueError("invalid cursor")
+            where.append("id > ?")
+        for field, value in (filters or {}).items():
+            self._columns(table, [field])
+            where.append(f"{field} = ?")
+            params.append(value)
+        if q:
+            # LIKE is case-insensitive for ASCII, like the Mongo regex search
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", q) + "%"
+            search = search or TABLE_COLUMNS[table]
+            self._columns(table, search)
+            where.append("(" + " OR ".join(f"{f} LIKE ? ESCAPE '\\'" for f in search) + ")")
+            params += [pattern] * len(search)
+
+        columns = ["id"] + [f for f in (fields or TABLE_COLUMNS[table]) if f in TABLE_COLUMNS[table]]
+        sql = (f"SELECT {', '.join(columns)} FROM {table}"
+               + (f" WHERE {' AND '.join(where)}" if where else "")
+               + " ORDER BY id LIMIT ?")
+        rows = self._conn().execute(sql, params + [limit]).fetchall()  # at most one page
+        return [_with_id(self._doc(row), row["id"]) for row in rows]
+
+    def insert(self, table, doc):
+        fields = tuple(f for f in TABLE_COLUMNS[table] if f in doc)
+        conn = self._conn()
+        with conn:
+            conn.execute(f"INSERT INTO {table} ({self._columns(table, fields)}) "
+                         f"VALUES ({', '.join('?' * len(fields))})", [doc[f] for f in fields])
+
+    def delete(self, table, record_id):
+        try:
+            record_id = int(record_id)
+        except (TypeError, ValueError):
+            raise ValueError("invalid record id")
+        conn = self._conn()
+        with conn:
+            row = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (record_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,))
+        return self._doc(row)
+
+
+def get_storage():
+    """Backend selected by STORAGE_BACKEND."""
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteStorage()
+    if STORAGE_BACKEND != "mongo":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return MongoStorage()
@@ -0,0 +1,72 @@
+"""
+Write-behind buffer for low-value writes (e.g. cities picked in the form).
+
+Items are collected in memory and handed to a flush callback in one batch,
+either when max_items have queued up or max_delay seconds after the first
+one arrived. Duplicates inside a batch collapse, and items flushed recently
+are skipped. A batch whose flush fails goes back into the buffer and is
+retried max_delay seconds later. Anything still queued is flushed at
+interpreter exit, so only a hard crash (or a database that stays down until
+exit) can lose a batch; keep it to data that can be re-entered.
+"""
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self, flush, max_items=50, max_delay=5.0, remember=10000):
+        self._flush = flush
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.remember = remember
+        self._items = {}      # insertion-ordered set
+        self._recent = set()  # already written; cleared when it grows past `remember`
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def add(self, item):
+        with self._lock:
+            if item in self._recent or item in self._items:
+                return
+            self._items[item] = None
+            if len(self._items) < self.max_items:
+                self._schedule()
+                return
+        self.flush()
+
+    def _schedule(self):
+        # Called with the lock held. Started lazily, so a forked worker starts its own
+        if self._timer is None:
+            self._timer = threading.Timer(self.max_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            items = list(self._items)
+            self._items = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not items:
+            return
+        try:
+            self._flush(items)
+        except Exception:
+            logger.exception("Write-behind flush of %d items failed; will retry", len(items))
+            with self._lock:
+                # Back in front of anything queued since, for the next flush
+                self._items = {**dict.fromkeys(items), **self._items}
+                self._schedule()
+            return
+        with self._lock:
+            if len(self._recent) + len(items) > self.remember:
+                self._recent.clear()
+            self._recent.update(items)
+
+    def __len__(self):
+        return len(self._items)